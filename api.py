@@ -0,0 +1,236 @@
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+# Read-only JSON mirrors of the HTML pages under /api/v1, built on the same
+# queries as the views in app.py. Every endpoint accepts ?fields=a,b,c to
+# return only those fields; listings are keyset-paginated and return the
+# cursor for the next page alongside the data.
+#
+# `python api.py` compares payload size and latency with the HTML pages.
+
+import json
+from datetime import datetime, timedelta
+
+from flask import Blueprint, Response, request, abort
+
+from models import Venue, Artist, Show, Genre
+from queries import (VENUE_WITHOUT_SHOWS, ARTIST_WITHOUT_SHOWS, venue_summary_query,
+                     artist_summary_query, after_id_page, shows_page, shows_listing,
+                     request_now, open_slots)
+from conditional import conditional, listing_state, venue_state, artist_state
+from routing import read_only
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# Availability windows default to a week and are capped at a month
+DEFAULT_WINDOW = timedelta(days=7)
+MAX_WINDOW = timedelta(days=31)
+
+VENUE_FIELDS = ("id", "name", "genres", "city", "state", "address", "phone", "website",
+                "facebook_link", "seeking_talent", "seeking_description", "image_link")
+ARTIST_FIELDS = ("id", "name", "genres", "city", "state", "phone", "website",
+                 "facebook_link", "seeking_venue", "seeking_description", "image_link")
+SHOW_PAGE_FIELDS = ("upcoming_shows", "upcoming_shows_count", "next_upcoming",
+                    "past_shows", "past_shows_count", "next_past")
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def respond(data):
+    # Compact JSON: no indentation or spaces after separators
+    return Response(json.dumps(data, separators=(",", ":"), default=_default),
+                    mimetype="application/json")
+
+
+def requested_fields(available):
+    # Fields named in ?fields=, in their declared order; all of them if absent
+    fields = request.args.get("fields")
+    if not fields:
+        return available
+    wanted = set(fields.split(","))
+    return tuple(field for field in available if field in wanted)
+
+
+def limit():
+    return max(1, min(request.args.get("limit", DEFAULT_LIMIT, type=int), MAX_LIMIT))
+
+
+#  Listings
+#  ----------------------------------------------------------------
+
+def summary_listing(query, model):
+    fields = requested_fields(("id", "name", "city", "state", "num_upcoming_shows"))
+    rows, next_after_id = after_id_page(query, model.id, request.args.get("after_id", type=int), limit())
+    return respond({
+        "data": [{field: getattr(row, field) for field in fields} for row in rows],
+        "next_after_id": next_after_id
+    })
+
+
+@api.route("/venues")
+@read_only
+@conditional(listing_state)
+def venues():
+    return summary_listing(venue_summary_query(), Venue)
+
+
+@api.route("/artists")
+@read_only
+@conditional(listing_state)
+def artists():
+    query = artist_summary_query()
+    genre = request.args.get("genre")
+    if genre:
+        query = query.join(Artist.genres).filter(Genre.name == genre)
+    return summary_listing(query, Artist)
+
+
+@api.route("/shows")
+@read_only
+@conditional(listing_state)
+def shows():
+    fields = requested_fields(("venue_id", "venue_name", "artist_id", "artist_name",
+                               "artist_image_link", "start_time"))
+    data, next_cursor = shows_listing(after=request.args.get("after"), per_page=limit())
+    return respond({
+        "data": [{field: show[field] for field in fields} for show in data],
+        "next_cursor": next_cursor
+    })
+
+
+#  Details
+#  ----------------------------------------------------------------
+
+def detail(instance, fields, show_column, counterpart, prefix):
+    if instance is None:
+        abort(404)
+    fields = requested_fields(fields + SHOW_PAGE_FIELDS)
+
+    data = {}
+    for field in fields:
+        if field == "genres":
+            data[field] = [genre.name for genre in instance.genres]
+        elif field not in SHOW_PAGE_FIELDS:
+            data[field] = getattr(instance, field)
+
+    # Only query shows when some show field was asked for
+    if any(field in SHOW_PAGE_FIELDS for field in fields):
+        shows = shows_page(show_column, instance.id, counterpart, prefix,
+                           upcoming_after=request.args.get("upcoming_after"),
+                           past_before=request.args.get("past_before"),
+                           per_page=limit())
+        data.update((field, shows[field]) for field in fields if field in SHOW_PAGE_FIELDS)
+
+    return respond(data)
+
+
+@api.route("/venues/<int:venue_id>")
+@read_only
+@conditional(venue_state)
+def venue(venue_id):
+    venue = Venue.query.options(*VENUE_WITHOUT_SHOWS).get(venue_id)
+    return detail(venue, VENUE_FIELDS, Show.venue_id, Artist, "artist")
+
+
+@api.route("/artists/<int:artist_id>")
+@read_only
+@conditional(artist_state)
+def artist(artist_id):
+    artist = Artist.query.options(*ARTIST_WITHOUT_SHOWS).get(artist_id)
+    return detail(artist, ARTIST_FIELDS, Show.artist_id, Venue, "venue")
+
+
+#  Availability
+#  ----------------------------------------------------------------
+
+def requested_time(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        value = datetime.fromisoformat(value)
+    except ValueError:
+        abort(400)
+    # Show times are stored as naive local time; convert offset-aware values
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def requested_window():
+    # (from, to) of an availability request, now + DEFAULT_WINDOW by default
+    start = requested_time("from", request_now())
+    end = requested_time("to", start + DEFAULT_WINDOW)
+    if end <= start or end - start > MAX_WINDOW:
+        abort(400)
+    return start, end
+
+
+def availability_state(now, venue_id):
+    # The venue's state plus the resolved window: without ?from= the window
+    # starts now, so the free slots change as time passes
+    state = venue_state(now, venue_id=venue_id)
+    if state.key is None:
+        return state
+    return state._replace(key=(state.key, requested_window()))
+
+
+@api.route("/venues/<int:venue_id>/availability")
+@read_only
+@conditional(availability_state)
+def venue_availability(venue_id):
+    # Free intervals of the venue between ?from= and ?to= (ISO 8601)
+    if Venue.query.options(*VENUE_WITHOUT_SHOWS).get(venue_id) is None:
+        abort(404)
+    start, end = requested_window()
+    return respond({
+        "from": start,
+        "to": end,
+        "slots": [{"start_time": slot_start, "end_time": slot_end}
+                  for slot_start, slot_end in open_slots(venue_id, start, end)]
+    })
+
+
+#  Benchmark
+#  ----------------------------------------------------------------
+
+def benchmark(shows=10000, repeat=20):
+    import timeit
+    import cache
+    from seed import seeded_app
+
+    # Limits match the rows each HTML page shows: every venue (shows / 50),
+    # 60 shows, 12 shows per section; /artists lists more than MAX_LIMIT
+    pairs = [
+        ("/venues", f"/api/v1/venues?limit={min(shows // 50, MAX_LIMIT)}"),
+        ("/artists", f"/api/v1/artists?limit={MAX_LIMIT}"),
+        ("/shows", "/api/v1/shows?limit=60"),
+        ("/venues/1", "/api/v1/venues/1?limit=12"),
+        ("/venues/1", "/api/v1/venues/1?limit=12&fields=id,name,upcoming_shows"),
+        ("/artists/1", "/api/v1/artists/1?limit=12"),
+    ]
+    client = seeded_app(shows).test_client()
+
+    def get(path):
+        # Cold page cache, so both sides run their queries
+        cache.page_cache.clear()
+        return len(client.get(path).data)
+
+    print(f"{shows} shows, best of {repeat}")
+    print(f"  {'api path':<56} {'html bytes':>11} {'json bytes':>11} {'html ms':>8} {'json ms':>8}")
+    for html, json_path in pairs:
+        sizes = get(html), get(json_path)
+        html_ms, json_ms = (min(timeit.repeat(lambda: get(path), number=1, repeat=repeat)) * 1000
+                            for path in (html, json_path))
+        print(f"  {json_path:<56} {sizes[0]:>11} {sizes[1]:>11} {html_ms:>8.2f} {json_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    benchmark()
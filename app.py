@@ -1,55 +1,68 @@
 #----------------------------------------------------------------------------#
 # Imports
 #----------------------------------------------------------------------------#
-from enum import unique
-import json
+import os
 import sys
-import dateutil.parser
-import babel
-from flask import Flask, jsonify, render_template, request, Response, flash, redirect, url_for
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
+from datetime import timedelta
+from flask import Flask, Blueprint, current_app, jsonify, render_template, request, Response, flash, redirect, url_for, stream_with_context, abort
 import logging
 from logging import Formatter, FileHandler
-from flask_wtf import Form
 from forms import *
+from phones import normalize_phone
 
+from flask_wtf.csrf import CSRFError
+from sqlalchemy.exc import IntegrityError
 
-from flask_script import Manager
-from flask_migrate import Migrate, MigrateCommand
+# Postgres SQLSTATE raised by the show booking exclusion constraints
+EXCLUSION_VIOLATION = '23P01'
 
-from flask_wtf.csrf import CSRFProtect,  CSRFError
+#Settings for FLASK_ENV
+from config import config_for, check_production
 
-#Models
+#Models and unbound extensions
 from models import *
 
+#Queries
+from queries import *
+from search import search
 
+#Show counters, bulk import/export and synthetic data
+import counters
+import importer
+import exporter
+import seed
 
+#Page cache
+from cache import init_cache, cached_page, venue_page_key, artist_page_key, invalidate
+from conditional import conditional, listing_state, venue_state, artist_state, touch
 
-#----------------------------------------------------------------------------#
-# Filters.
-#----------------------------------------------------------------------------#
+#Replica routing
+from routing import read_only, pool_stats
 
-def format_datetime(value, format='medium'):
-  if isinstance(value, str):
-      date = dateutil.parser.parse(value)
-  else:
-    #alter the formatting filter to accept datetime values
-      date = value  
+#Template bytecode cache and {% cache %} fragments
+from templating import init_templates
+
+#Request profiling (Server-Timing header and slow query log)
+from profiling import init_profiling
+
+#Prometheus metrics at /metrics
+from metrics import init_metrics
 
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+#JSON API
+from api import api
+
+#Filters
+from formatting import format_datetime, format_column, format_stream
+
+# The HTML pages; create_app() registers them next to the API
+main = Blueprint("main", __name__)
 
-app.jinja_env.filters['datetime'] = format_datetime
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@main.route('/')
 def index():
   return render_template('pages/home.html')
 
@@ -60,110 +73,68 @@ def index():
 
 # (*) TODO: replace with real venues data.
 #           num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
-@app.route('/venues')
+@main.route('/venues')
+@read_only
+@conditional(listing_state)
 def venues():
-    data = []
-    results = Venue.query.distinct(Venue.city, Venue.state).all()
-    for result in results:
-        city_state = {
-            "city": result.city,
-            "state": result.state
-        }
+    # Areas, venues and upcoming show counts come from one query
+    data = venue_areas()
 
-        venues = Venue.query.filter_by(city=result.city, state=result.state).all()
-
-        # Formatting venues in database
-        formatted_venues = []
-        for venue in venues:
-            formatted_venues.append({
-                "id": venue.id,
-                "name": venue.name,
-                "num_upcoming_shows": len(list(filter(lambda x: x.start_time > datetime.now(), venue.shows)))
-            })
-        
-        city_state["venues"] = formatted_venues
-        data.append(city_state)
-   
     return render_template('pages/venues.html', areas=data)
 
-@app.route('/venues/search', methods=['POST'])
+@main.route('/venues/search', methods=['POST'])
+@read_only
 @csrf.exempt
 def search_venues():
   # (*) TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     search_term = request.form.get("search_term", "")
 
     response = {}
-    all_venues = list(Venue.query.filter(
-        Venue.name.ilike(f"%{search_term}%") |
-        Venue.state.ilike(f"%{search_term}%") |
-        Venue.city.ilike(f"%{search_term}%") 
-    ).all())
-    response["count"] = len(all_venues)
+    count, all_venues = search(Venue, search_term, options=VENUE_WITHOUT_SHOWS)
+    response["count"] = count
     response["data"] = []
 
+    upcoming = upcoming_show_counts(Show.venue_id, [venue.id for venue in all_venues])
     for venue in all_venues:
         venue_unit = {
             "id": venue.id,
             "name": venue.name,
-            "num_upcoming_shows": len(list(filter(lambda x: x.start_time > datetime.now(), venue.shows)))
+            "num_upcoming_shows": upcoming[venue.id]
         }
         response["data"].append(venue_unit)
 
     return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
-@app.route('/venues/<int:venue_id>')
+@main.route('/venues/<int:venue_id>')
+@read_only
+@cached_page(venue_page_key, venue_state)
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
   # (*) TODO: replace with real venue data from the venues table, using venue_id
   
-  venue = Venue.query.get(venue_id)
-
-  # Filtering and saving Past shows and Upcoming shows 
-  #Past shows
-  past_shows_query = db.session.query(Show).join(Venue).filter(Show.venue_id==venue_id).filter(Show.start_time>datetime.now())
-  past_shows = []
-
-  #Storing shows data from query as venue objects
-  for show in past_shows_query:
-    past_show = {
-      "artist_id": show.artists.id,
-      "artist_name":   show.artists.name,
-      "artist_image_link": show.artists.image_link,
-      "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M:%S")
-    }
-    past_shows.append(past_show)
-  #Upcoming shows
-  upcoming_shows_query = db.session.query(Show).join(Venue).filter(Show.venue_id==venue_id).filter(Show.start_time<datetime.now())
-  upcoming_shows = []
-
-  #Storing shows data from query as venue objects
-  for show in upcoming_shows_query:
-    upcoming_show = {
-      "artist_id": show.artists.id,
-      "artist_name":   show.artists.name,
-      "artist_image_link": show.artists.image_link,
-      "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M:%S")
-    }
-    upcoming_shows.append(upcoming_show)
-
-  #Setting attributes for template  
-  setattr(venue,"past_shows", past_shows)
-  setattr(venue,"past_shows_count", len(past_shows))
-  setattr(venue,"upcoming_shows", upcoming_shows)
-  setattr(venue,"upcoming_shows_count", len(upcoming_shows))  
-  setattr(venue, "genres", venue.genres.split(",")) # seperating genres into list
-
-  return render_template('pages/show_venue.html', venue=venue)
+  venue = Venue.query.options(*VENUE_WITHOUT_SHOWS).get(venue_id)
+  if venue is None:
+    abort(404)
+
+  # Past and upcoming shows, one keyset-paginated slice each
+  shows = shows_page(Show.venue_id, venue_id, Artist, "artist",
+                     upcoming_after=request.args.get("upcoming_after"),
+                     past_before=request.args.get("past_before"))
+
+  format_column(shows["upcoming_shows"])
+  format_column(shows["past_shows"])
+
+  return render_template('pages/show_venue.html', venue=venue, shows=shows)
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
 @csrf.exempt
 def create_venue_submission():
   #(*) TODO: insert form data as a new Venue record in the db, instead
@@ -179,7 +150,7 @@ def create_venue_submission():
           state=form.state.data,
           address=form.address.data,
           phone=form.phone.data,
-          genres=",".join(form.genres.data),
+          genres=Genre.from_names(form.genres.data),
           facebook_link=form.facebook_link.data,
           image_link=form.image_link.data,
           seeking_talent=form.seeking_talent.data,
@@ -205,18 +176,21 @@ def create_venue_submission():
       flash("Venue was Not edited successfully.")
     
 
-  return redirect(url_for("index"))
+  return redirect(url_for("main.index"))
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@main.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
   # (*) TODO: Complete this endpoint for taking a venue_id, and using
   # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
   try:
-    venue = Venue.query.filter_by(id=venue_id)
+    venue = Venue.query.options(*VENUE_WITH_SHOWS).get(venue_id)
+    name = venue.name
+    artist_ids = counterpart_ids(Show.venue_id, Show.artist_id, venue_id)
     db.session.delete(venue)
     db.session.commit()
-    flash("Venue " + venue.name + " was deleted successfully!")
+    invalidate(venue_ids=[venue_id], artist_ids=artist_ids)
+    flash("Venue " + name + " was deleted successfully!")
   except:
       db.session.rollback()
       print(sys.exc_info())
@@ -231,100 +205,78 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@main.route('/artists')
+@read_only
+@conditional(listing_state)
 def artists():
   # (*) TODO: replace with real data returned from querying the database
-  artists = db.session.query(Artist.id, Artist.name).all()
-  return render_template('pages/artists.html', artists=artists)
+  artists = db.session.query(Artist.id, Artist.name)
+
+  # ?genre=Jazz narrows the list through the artist_genre index
+  genre = request.args.get("genre")
+  if genre:
+    artists = artists.join(Artist.genres).filter(Genre.name == genre)
 
-@app.route('/artists/search', methods=['POST'])
+  return render_template('pages/artists.html', artists=artists.all())
+
+@main.route('/artists/search', methods=['POST'])
+@read_only
 @csrf.exempt
 def search_artists():
   # (*) TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   search_term = request.form.get('search_term', '')
 
   response = {}
-  all_artists = Artist.query.filter(
-      Artist.name.ilike(f"%{search_term}%") |
-      Artist.city.ilike(f"%{search_term}%") |
-      Artist.state.ilike(f"%{search_term}%")
-  ).all()
-  response["count"] = len(all_artists)
+  count, all_artists = search(Artist, search_term, options=ARTIST_WITHOUT_SHOWS)
+  response["count"] = count
   response["data"] = []
 
+  upcoming = upcoming_show_counts(Show.artist_id, [artist.id for artist in all_artists])
   for artist in all_artists:
       temp = {}
       temp["name"] = artist.name
       temp["id"] = artist.id
-
-      upcoming_shows = 0
-      for show in artist.shows:
-          if show.start_time > datetime.now():
-              upcoming_shows = upcoming_shows + 1
-      temp["upcoming_shows"] = upcoming_shows
+      temp["upcoming_shows"] = upcoming[artist.id]
 
       response["data"].append(temp)
 
 
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
-@app.route('/artists/<int:artist_id>')
+@main.route('/artists/<int:artist_id>')
+@read_only
+@cached_page(artist_page_key, artist_state)
 def show_artist(artist_id):
     # shows the artist page with the given artist_id
     # (*) TODO: replace with real artist data from the artist table, using artist_id
 
-    artist = Artist.query.get(artist_id)
-
-    # Filtering and saving Past shows and Upcoming shows 
-    #Past shows
-    past_shows_query = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time>datetime.now())
-    past_shows = []
-
-    #Storing shows data from query as venue objects
-    for show in past_shows_query:
-      past_show = {
-        "venue_id": show.venues.id,
-        "venue_name":   show.venues.name,
-        "venue_image_link": show.venues.image_link,
-        "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M:%S")
-      }
-      past_shows.append(past_show)
-    #Upcoming shows
-    upcoming_shows_query = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time<datetime.now())
-    upcoming_shows = []
-
-    #Storing shows data from query as venue objects
-    for show in upcoming_shows_query:
-      upcoming_show = {
-        "venue_id": show.venues.id,
-        "venue_name":   show.venues.name,
-        "venue_image_link": show.venues.image_link,
-        "start_time": show.start_time.strftime("%m/%d/%Y, %H:%M:%S")
-      }
-      upcoming_shows.append(upcoming_show)
-
-    #Setting attributes for template
-    setattr(artist,"past_shows_count", len(past_shows))
-    setattr(artist,"past_shows", past_shows)    
-    setattr(artist,"upcoming_shows_count", len(upcoming_shows))
-    setattr(artist,"upcoming_shows", upcoming_shows)
-    setattr(artist, "genres", artist.genres.split(",")) 
-
-    return render_template('pages/show_artist.html', artist=artist)
+    artist = Artist.query.options(*ARTIST_WITHOUT_SHOWS).get(artist_id)
+    if artist is None:
+        abort(404)
+
+    # Past and upcoming shows, one keyset-paginated slice each
+    shows = shows_page(Show.artist_id, artist_id, Venue, "venue",
+                       upcoming_after=request.args.get("upcoming_after"),
+                       past_before=request.args.get("past_before"))
+
+    format_column(shows["upcoming_shows"])
+    format_column(shows["past_shows"])
+
+    return render_template('pages/show_artist.html', artist=artist, shows=shows)
 
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   form = ArtistForm()
 
   #(*) TODO: populate form with fields from artist with ID <artist_id>
-  artist = Artist.query.get(artist_id)
+  artist = Artist.query.options(*ARTIST_WITHOUT_SHOWS).get(artist_id)
 
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 
 def edit_artist_submission(artist_id):
   # (*) TODO: take values from the form submitted, and update existing
@@ -332,13 +284,14 @@ def edit_artist_submission(artist_id):
   form = ArtistForm(request.form)
   if form.validate():
     try:
-      artist = Artist.query.get(artist_id)
+      artist = Artist.query.options(*ARTIST_WITHOUT_SHOWS).get(artist_id)
   # artist record with ID <artist_id> using the new attributes
       artist.name = form.name.data
       artist.city=form.city.data
       artist.state=form.state.data
       artist.phone=form.phone.data
-      artist.genres=",".join(form.genres.data)
+      artist.phone_e164=normalize_phone(form.phone.data)
+      artist.genres=Genre.from_names(form.genres.data)
       artist.facebook_link=form.facebook_link.data
       artist.image_link=form.image_link.data
       artist.seeking_venue=form.seeking_venue.data
@@ -346,7 +299,11 @@ def edit_artist_submission(artist_id):
       artist.website_link=form.website_link.data
 
       db.session.add(artist)
+      # The artist's page and every venue page listing its shows
+      venue_ids = counterpart_ids(Show.artist_id, Show.venue_id, artist_id)
+      touch(Venue, venue_ids)
       db.session.commit()
+      invalidate(artist_ids=[artist_id], venue_ids=venue_ids)
       flash("Artist " + artist.name + " was successfully edited!")
     except:
         db.session.rollback()
@@ -358,18 +315,18 @@ def edit_artist_submission(artist_id):
       print("\n\n", form.errors)
       flash("Artist was not edited successfully.")      
 
-  return redirect(url_for('show_artist', artist_id=artist_id))
+  return redirect(url_for('main.show_artist', artist_id=artist_id))
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
   form = VenueForm()
 
   # (*) TODO: populate form with values from venue with ID <venue_id>
-  venue = Venue.query.get(venue_id)
+  venue = Venue.query.options(*VENUE_WITHOUT_SHOWS).get(venue_id)
 
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 @csrf.exempt
 def edit_venue_submission(venue_id):
   # (*) TODO: take values from the form submitted, and update existing
@@ -377,14 +334,14 @@ def edit_venue_submission(venue_id):
     
     if form.validate():
         try:
-            venue = Venue.query.get(venue_id)
+            venue = Venue.query.options(*VENUE_WITHOUT_SHOWS).get(venue_id)
 
             venue.name = form.name.data
             venue.city=form.city.data
             venue.state=form.state.data
             venue.address=form.address.data
             venue.phone=form.phone.data
-            venue.genres=",".join(form.genres.data)
+            venue.genres=Genre.from_names(form.genres.data)
             venue.facebook_link=form.facebook_link.data
             venue.image_link=form.image_link.data
             venue.seeking_talent=form.seeking_talent.data
@@ -392,7 +349,11 @@ def edit_venue_submission(venue_id):
             venue.website=form.website_link.data
 
             db.session.add(venue)
+            # The venue's page and every artist page listing its shows
+            artist_ids = counterpart_ids(Show.venue_id, Show.artist_id, venue_id)
+            touch(Artist, artist_ids)
             db.session.commit()
+            invalidate(venue_ids=[venue_id], artist_ids=artist_ids)
 
             flash("Venue " + form.name.data + " edited successfully")
             
@@ -407,17 +368,17 @@ def edit_venue_submission(venue_id):
         flash("Venue was not edited successfully.")
 
   # venue record with ID <venue_id> using the new attributes
-    return redirect(url_for('show_venue', venue_id=venue_id))
+    return redirect(url_for('main.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
 @csrf.exempt
 def create_artist_submission():
   # called upon submitting the new artist listing form
@@ -431,7 +392,8 @@ def create_artist_submission():
         city=form.city.data,
         state=form.state.data,
         phone=form.phone.data,
-        genres=",".join(form.genres.data),
+        phone_e164=normalize_phone(form.phone.data),
+        genres=Genre.from_names(form.genres.data),
         facebook_link=form.facebook_link.data,
         image_link=form.image_link.data,
         seeking_venue=form.seeking_venue.data,
@@ -459,50 +421,63 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@main.route('/shows')
+@read_only
+@conditional(listing_state)
 def shows():
   # displays list of shows at /shows
   # (*) TODO: replace with real venues data.
-  data = []
- 
-  shows = Show.query.all()
-  for show in shows:
-      temp = {}
-      temp["venue_id"] = show.venues.id
-      temp["venue_name"] = show.venues.name
-      temp["artist_id"] = show.artists.id
-      temp["artist_name"] = show.artists.name
-      temp["artist_image_link"] = show.artists.image_link
-      temp["start_time"] = show.start_time.strftime("%m/%d/%Y, %H:%M:%S")
-      
-      data.append(temp)
-
-  return render_template('pages/shows.html', shows=data)
-
-@app.route('/shows/create')
+
+  # ?stream=1 renders every show as rows arrive from a server-side cursor
+  if request.args.get("stream"):
+    context = {"shows": format_stream(stream_shows()), "next_cursor": None}
+    current_app.update_template_context(context)
+    template = current_app.jinja_env.get_template('pages/shows.html')
+    return Response(stream_with_context(template.generate(context)))
+
+  data, next_cursor = shows_listing(after=request.args.get("after"))
+
+  return render_template('pages/shows.html', shows=format_column(data), next_cursor=next_cursor)
+
+@main.route('/shows/create')
 def create_shows():
   # renders form. do not touch.
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
+@main.route('/shows/create', methods=['POST'])
 @csrf.exempt
 def create_show_submission():
   form = ShowForm(request.form)
    # called to create new shows in the db, upon submitting new show listing form
   # (*) TODO: insert form data as a new Show record in the db, instead
   if form.validate():
+    end_time = form.start_time.data + timedelta(minutes=form.duration.data)
+    conflict = booking_conflict(form.venue_id.data, form.artist_id.data, form.start_time.data, end_time)
+    if conflict:
+      flash('Show was not listed: the ' + conflict + ' is already booked at that time.')
+      return render_template('pages/home.html')
     try:
       new_show = Show(
                     artist_id=form.artist_id.data,
                     venue_id=form.venue_id.data,
-                    start_time=form.start_time.data
+                    start_time=form.start_time.data,
+                    end_time=end_time
                 )
       db.session.add(new_show)
       db.session.commit()
+      invalidate(venue_ids=[form.venue_id.data], artist_ids=[form.artist_id.data])
     # on successful db insert, flash success
       flash('Show was successfully listed!')
-    
+
+    except IntegrityError as e:
+      db.session.rollback()
+      print(sys.exc_info())
+      if getattr(e.orig, 'pgcode', None) == EXCLUSION_VIOLATION:
+        # a concurrent booking won the race and the exclusion constraint rejected this one
+        flash('Show was not listed: the venue or artist is already booked at that time.')
+      else:
+        flash('Show was not successfully listed.')
     except Exception:
       db.session.rollback()
       print(sys.exc_info())
@@ -517,41 +492,95 @@ def create_show_submission():
 
   return render_template('pages/home.html')
 
+#  Export
+#  ----------------------------------------------------------------
+
+@main.route('/export/<any(venues, artists, shows):kind>')
+@read_only
+def export_catalogue(kind):
+  # streams the whole table; resume an interrupted export with ?after_id=<last id received>
+  format = request.args.get("format", "jsonl")
+  if format not in exporter.FORMATS:
+    abort(400)
+  after_id = request.args.get("after_id", type=int)
+
+  body = exporter.export(kind, format, after_id)
+  return Response(stream_with_context(body), mimetype=exporter.FORMATS[format])
+
+@main.route('/health/pool')
+def pool_health():
+  # connection pool checkouts, wait time and gauges per engine
+  return jsonify(pool_stats())
+
 #To get rid of CSRF error on form submissions.
-@app.errorhandler(CSRFError)
+@main.app_errorhandler(CSRFError)
 def handle_csrf_error(e):
   return render_template('csrf_error.html',reason=e.description), 400
 
-@app.errorhandler(404)
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+#----------------------------------------------------------------------------#
+# App factory.
+#----------------------------------------------------------------------------#
+
+def create_app(config=None):
+    # config is a config class or its dotted path; defaults to the one for FLASK_ENV
+    app = Flask(__name__)
+    app.config.from_object(config or config_for())
+    check_production(app.config)
+
+    db.init_app(app)
+    csrf.init_app(app)
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        # Only `flask db` needs Flask-Migrate; WSGI workers skip importing it and Alembic
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    init_cache(app)
+    init_templates(app)
+    init_profiling(app)
+    init_metrics(app)
+    app.jinja_env.filters['datetime'] = format_datetime
+
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+
+    for command in (counters.roll_forward_command, counters.reconcile_command,
+                    importer.import_command, exporter.export_command, seed.seed_command):
+        app.cli.add_command(command)
+
+    if not app.debug and not app.testing:
+        file_handler = FileHandler('error.log')
+        file_handler.setFormatter(
+            Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+
+    return app
 
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
+# `flask run` (FLASK_APP=app) finds create_app() on its own; WSGI servers
+# take it as e.g. `gunicorn "app:create_app()"`.
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,145 @@
+#----------------------------------------------------------------------------#
+# Async read path.
+#----------------------------------------------------------------------------#
+# A small ASGI app for the read-only search endpoints, backed by SQLAlchemy's
+# asyncio engine so a worker is never blocked on Postgres. Writes and HTML
+# pages stay on the Flask app. Run it next to the WSGI server and route
+# /async/ to it, e.g.
+#
+#   uvicorn asgi:app --workers 4
+#
+# Endpoints (JSON, same shape as the HTML search results):
+#   GET /async/venues/search?search_term=...
+#   GET /async/artists/search?search_term=...
+#   GET /async/search?search_term=...     venues and artists, queried concurrently
+
+import asyncio
+import json
+import os
+from datetime import datetime
+from urllib.parse import parse_qs
+
+import sqlalchemy as sa
+from flask import Config
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config import config_for
+from models import Venue, Artist, Show
+from search import SEARCH_COLUMNS, SEARCH_LIMIT
+
+
+def async_url(url):
+    # postgresql://... -> postgresql+asyncpg://..., sqlite://... -> sqlite+aiosqlite://...
+    for sync, driver in (("postgresql://", "postgresql+asyncpg://"), ("sqlite://", "sqlite+aiosqlite://")):
+        if url.startswith(sync):
+            return driver + url[len(sync):]
+    return url
+
+
+# Only the config is needed here, not a whole Flask app
+settings = Config(os.path.dirname(os.path.abspath(__file__)))
+settings.from_object(config_for())
+
+DATABASE_URL = async_url(settings["SQLALCHEMY_DATABASE_URI"])
+# SQLite (the testing config) takes no pool sizing
+engine = create_async_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,
+    **({} if DATABASE_URL.startswith("sqlite") else {"pool_size": settings.get("ASYNC_POOL_SIZE", 10)})
+)
+
+
+# Show column pointing at each searchable model
+SHOW_COLUMNS = {Venue: Show.venue_id, Artist: Show.artist_id}
+
+
+async def upcoming_show_counts(connection, model, ids):
+    # Live counts, as queries.upcoming_show_counts() gives the Flask search
+    # pages, so both report the same numbers between counter reconciles
+    if not ids:
+        return {}
+    show_column = SHOW_COLUMNS[model]
+    rows = await connection.execute(
+        sa.select(show_column, sa.func.count(Show.id))
+          .where(show_column.in_(ids), Show.start_time > datetime.now())
+          .group_by(show_column)
+    )
+    counts = dict.fromkeys(ids, 0)
+    counts.update(rows.all())
+    return counts
+
+
+async def search(model, term, limit=SEARCH_LIMIT):
+    # Same matching, ranking and upcoming show counts as the search pages
+    columns = [getattr(model, name) for name in SEARCH_COLUMNS[model]]
+    matched = sa.or_(*[column.ilike(f"%{term}%") for column in columns])
+    if engine.dialect.name == "postgresql":
+        order = (sa.func.greatest(*[sa.func.similarity(column, term) for column in columns]).desc(), model.id)
+    else:
+        # No pg_trgm (SQLite test databases): unranked, in id order
+        order = (model.id,)
+
+    async with engine.connect() as connection:
+        count = await connection.scalar(sa.select(sa.func.count()).select_from(model).where(matched))
+        rows = (await connection.execute(
+            sa.select(model.id, model.name)
+              .where(matched)
+              .order_by(*order)
+              .limit(limit)
+        )).all()
+        upcoming = await upcoming_show_counts(connection, model, [id for id, _ in rows])
+        data = [{"id": id, "name": name, "num_upcoming_shows": upcoming[id]} for id, name in rows]
+
+    return {"count": count, "data": data}
+
+
+async def search_both(term):
+    venues, artists = await asyncio.gather(search(Venue, term), search(Artist, term))
+    return {"venues": venues, "artists": artists}
+
+
+ROUTES = {
+    "/async/venues/search": lambda term: search(Venue, term),
+    "/async/artists/search": lambda term: search(Artist, term),
+    "/async/search": search_both,
+}
+
+
+async def send_json(send, status, data):
+    body = json.dumps(data, separators=(",", ":")).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] == "websocket":
+        # Nothing here speaks websockets: refuse the handshake
+        await receive()
+        await send({"type": "websocket.close", "code": 1003})
+        return
+
+    if scope["type"] != "http":
+        raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    handler = ROUTES.get(scope["path"])
+    if scope["method"] != "GET" or handler is None:
+        await send_json(send, 404, {"error": "not found"})
+        return
+
+    query = parse_qs(scope["query_string"].decode())
+    term = query.get("search_term", [""])[0]
+    await send_json(send, 200, await handler(term))
@@ -0,0 +1,187 @@
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+# Rendered detail pages and template fragments, looked up before any query.
+# invalidate() and the session hooks below drop entries in this process
+# only: with the default LocalCache, other workers keep serving a page they
+# cached until it expires, so cross-worker staleness is bounded by
+# PAGE_CACHE_TTL (FRAGMENT_CACHE_TTL for fragments). Set PAGE_CACHE_BACKEND
+# to a cache shared by every worker to have invalidation reach them all.
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, session
+
+from sqlalchemy import event
+from werkzeug.utils import import_string
+
+from models import db, Venue, Artist, Show, Genre
+from conditional import conditional, entity_tag, respond
+from queries import request_now
+from metrics import PAGE_CACHE
+
+_hits = PAGE_CACHE.labels("hit")
+_misses = PAGE_CACHE.labels("miss")
+
+
+class LocalCache:
+    # In-process LRU cache with a per-entry TTL. Any object with the same
+    # get/set/delete/clear methods (e.g. a shared Redis-backed one) can be
+    # swapped in with set_backend().
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# Sized from the app config by init_cache()
+page_cache = LocalCache()
+
+# Rendered template fragments, see templating.py
+fragment_cache = LocalCache()
+
+
+def init_cache(app):
+    global page_cache, fragment_cache
+    backend = app.config.get("PAGE_CACHE_BACKEND")
+    if backend:
+        page_cache = import_string(backend)(app)
+    else:
+        page_cache = LocalCache(
+            max_entries=app.config.get("PAGE_CACHE_MAX_ENTRIES", 1024),
+            ttl=app.config.get("PAGE_CACHE_TTL", 300)
+        )
+    fragment_cache = LocalCache(
+        max_entries=app.config.get("FRAGMENT_CACHE_MAX_ENTRIES", 50000),
+        ttl=app.config.get("FRAGMENT_CACHE_TTL", 300)
+    )
+
+
+def set_backend(backend):
+    global page_cache
+    page_cache = backend
+
+
+#  Keys
+#  ----------------------------------------------------------------
+
+def venue_page_key(venue_id):
+    return f"venue:{venue_id}"
+
+
+def artist_page_key(artist_id):
+    return f"artist:{artist_id}"
+
+
+def invalidate(venue_ids=(), artist_ids=()):
+    keys = [venue_page_key(id) for id in venue_ids] + [artist_page_key(id) for id in artist_ids]
+    if keys:
+        page_cache.delete(*keys)
+    invalidate_fragments()
+
+
+def invalidate_fragments():
+    # Fragments can show any venue, artist or show, so a write drops them all
+    fragment_cache.clear()
+
+
+@event.listens_for(db.session, "after_flush")
+def _wrote_catalogue(session, flush_context):
+    if any(isinstance(instance, (Venue, Artist, Show, Genre))
+           for instance in itertools.chain(session.new, session.dirty, session.deleted)):
+        session.info["catalogue_written"] = True
+
+
+@event.listens_for(db.session, "after_commit")
+def _drop_fragments(session):
+    if session.info.pop("catalogue_written", False):
+        invalidate_fragments()
+
+
+@event.listens_for(db.session, "after_rollback")
+def _forget_write(session):
+    session.info.pop("catalogue_written", None)
+
+
+#  View decorator
+#  ----------------------------------------------------------------
+
+def cached_page(key, state_of):
+    # Caches the rendered HTML of a detail view under key(**view_args),
+    # together with the ETag/Last-Modified of the state (see conditional.py)
+    # it was rendered from. A hit answers from the entry alone, conditional
+    # GETs included, without touching the database; a miss reads the state
+    # before rendering, so the body is never older than its ETag. Entries
+    # expire at PAGE_CACHE_TTL or when the next show starts, whichever is
+    # sooner. Only the default page is cached: paginated slices
+    # (?upcoming_after= etc.) and responses carrying flashed messages always
+    # render fresh.
+    def decorator(view):
+        uncached = conditional(state_of)(view)
+
+        @wraps(view)
+        def wrapper(**kwargs):
+            if request.args or session.get("_flashes"):
+                return uncached(**kwargs)
+
+            cache_key = key(**kwargs)
+            entry = page_cache.get(cache_key)
+            if entry is None:
+                _misses.inc()
+                now = request_now()
+                state = state_of(now, **kwargs)
+                if state.key is None:
+                    return view(**kwargs)
+                html = view(**kwargs)
+                if not isinstance(html, str):
+                    return html
+                entry = (html, entity_tag(state), state.modified)
+                page_cache.set(cache_key, entry,
+                               seconds_until(state.expires, now, current_app.config.get("PAGE_CACHE_TTL", 300)))
+            else:
+                _hits.inc()
+            html, etag, modified = entry
+            return respond(etag, modified, lambda: html)
+        return wrapper
+    return decorator
+
+
+def seconds_until(expires, now, ttl):
+    # TTL for an entry that goes stale at `expires` (if ever), at most ttl
+    if expires is None:
+        return ttl
+    return max(1, min(ttl, (expires - now).total_seconds()))
@@ -0,0 +1,121 @@
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+import hashlib
+from collections import namedtuple
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import request, session, make_response, Response
+
+from models import db, Venue, Artist, Show
+from queries import request_now
+
+
+# What a page was rendered from: `key` identifies that state (None when the
+# venue/artist doesn't exist), `modified` is its Last-Modified and `expires`
+# the local time the page changes on its own (the next show to start), if any
+State = namedtuple("State", "key modified expires")
+
+
+def listing_state(now, **view_args):
+    # Listings can show any row: the latest write and row count of every
+    # table they read, plus the most recent show to have moved from upcoming
+    # to past. The maxima are index lookups; the counts scan each table, so
+    # only the listing pages pay for them. All fetched in one round trip.
+    venues_updated, venues, artists_updated, artists, shows_updated, shows, last_past_show = db.session.query(
+        db.session.query(db.func.max(Venue.updated_at)).as_scalar(),
+        db.session.query(db.func.count(Venue.id)).as_scalar(),
+        db.session.query(db.func.max(Artist.updated_at)).as_scalar(),
+        db.session.query(db.func.count(Artist.id)).as_scalar(),
+        db.session.query(db.func.max(Show.updated_at)).as_scalar(),
+        db.session.query(db.func.count(Show.id)).as_scalar(),
+        db.session.query(db.func.max(Show.start_time)).filter(Show.start_time <= now).as_scalar()
+    ).one()
+    modified = last_modified((venues_updated, artists_updated, shows_updated), last_past_show)
+    return State((venues_updated, venues, artists_updated, artists, shows_updated, shows, last_past_show),
+                 modified, None)
+
+
+def entity_state(model, show_column):
+    # A detail page depends on one venue or artist: its own updated_at, which
+    # show inserts and deletes bump through the counters (see counters.py) and
+    # edits of the other side bump through touch(), and its latest past show.
+    # The next upcoming show is when the page next changes by itself. All
+    # index lookups, fetched in one round trip.
+    def state(now, **view_args):
+        id, = view_args.values()
+        row = db.session.query(
+            model.updated_at,
+            db.session.query(db.func.max(Show.start_time))
+                .filter(show_column == id, Show.start_time <= now).as_scalar(),
+            db.session.query(db.func.min(Show.start_time))
+                .filter(show_column == id, Show.start_time > now).as_scalar()
+        ).filter(model.id == id).first()
+        if row is None:
+            return State(None, None, None)
+        updated, last_past_show, next_show = row
+        return State((id, updated, last_past_show), last_modified((updated,), last_past_show), next_show)
+    return state
+
+
+venue_state = entity_state(Venue, Show.venue_id)
+artist_state = entity_state(Artist, Show.artist_id)
+
+
+def last_modified(updated_times, last_past_show):
+    # updated_at is stored in UTC, start_time in local time
+    times = [time.replace(tzinfo=timezone.utc) for time in updated_times if time]
+    if last_past_show:
+        times.append(last_past_show.astimezone(timezone.utc))
+    return max(times, default=None)
+
+
+def touch(model, ids):
+    # Marks the pages of these venues or artists as changed, e.g. every venue
+    # an edited artist has played, whose pages show the artist's name
+    if ids:
+        db.session.query(model).filter(model.id.in_(ids)) \
+            .update({model.updated_at: datetime.utcnow()}, synchronize_session=False)
+
+
+def entity_tag(state):
+    return hashlib.sha1(repr((request.full_path, state.key)).encode()).hexdigest()
+
+
+def respond(etag, modified, render):
+    # 304 Not Modified if the client's copy carries etag (or is at least as
+    # recent as modified), otherwise render()'s response; both with validators
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        since = request.if_modified_since
+        if since and since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        not_modified = bool(since and modified and modified.replace(microsecond=0) <= since)
+
+    response = Response(status=304) if not_modified else make_response(render())
+    response.set_etag(etag)
+    if modified:
+        response.last_modified = modified
+    return response
+
+
+def conditional(state_of):
+    # Sets ETag/Last-Modified on a read-only page and answers 304 Not Modified
+    # before the view runs when the client's copy is still current.
+    # state_of(now, **view_args) returns a State; a None key (no such
+    # venue/artist) lets the view answer.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            state = state_of(request_now(), **kwargs)
+            if state.key is None:
+                return view(*args, **kwargs)
+            return respond(entity_tag(state), state.modified, lambda: view(*args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,137 @@
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+# Venue and Artist carry denormalized past_shows_count/upcoming_shows_count
+# columns. They are adjusted in the same transaction as every show insert and
+# delete; `flask roll-forward-counters` moves shows from upcoming to past as
+# time passes (run it periodically, e.g. from cron every few minutes), and
+# `flask reconcile-counters` checks them against the show table.
+
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event
+
+from models import db, Venue, Artist, Show
+
+
+# (model, Show foreign key column) for each counted side of a show
+COUNTED = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+
+def _adjust(connection, model, id, is_past, delta):
+    table = model.__table__
+    column = table.c.past_shows_count if is_past else table.c.upcoming_shows_count
+    connection.execute(
+        table.update().where(table.c.id == id).values({column: column + delta})
+    )
+
+
+@event.listens_for(Show, "before_insert")
+def _classify_show(mapper, connection, target):
+    target.is_past = target.start_time <= datetime.now()
+
+
+@event.listens_for(Show, "after_insert")
+def _count_show(mapper, connection, target):
+    _adjust(connection, Venue, target.venue_id, target.is_past, 1)
+    _adjust(connection, Artist, target.artist_id, target.is_past, 1)
+
+
+@event.listens_for(Show, "after_delete")
+def _uncount_show(mapper, connection, target):
+    _adjust(connection, Venue, target.venue_id, target.is_past, -1)
+    _adjust(connection, Artist, target.artist_id, target.is_past, -1)
+
+
+def count_bulk_shows(connection, rows):
+    # Counter adjustments for shows inserted in bulk through Core, where the
+    # mapper events above don't fire. Each row needs venue_id, artist_id and
+    # is_past; every affected entity is updated once.
+    for model, show_column in COUNTED:
+        deltas = {}
+        for row in rows:
+            past, upcoming = deltas.get(row[show_column.key], (0, 0))
+            deltas[row[show_column.key]] = (past + 1, upcoming) if row["is_past"] else (past, upcoming + 1)
+
+        table = model.__table__
+        connection.execute(
+            table.update()
+                .where(table.c.id == db.bindparam("_id"))
+                .values(
+                    past_shows_count=table.c.past_shows_count + db.bindparam("_past"),
+                    upcoming_shows_count=table.c.upcoming_shows_count + db.bindparam("_upcoming")
+                ),
+            [{"_id": id, "_past": past, "_upcoming": upcoming} for id, (past, upcoming) in deltas.items()]
+        )
+
+
+def roll_forward(now=None):
+    # Moves shows whose start_time has passed from the upcoming to the past
+    # counters. Returns the number of shows moved.
+    if now is None:
+        now = datetime.now()
+
+    due = (~Show.is_past) & (Show.start_time <= now)
+    for model, show_column in COUNTED:
+        rows = db.session.query(show_column, db.func.count(Show.id)) \
+            .filter(due) \
+            .group_by(show_column) \
+            .all()
+        for id, count in rows:
+            db.session.query(model).filter(model.id == id).update({
+                model.past_shows_count: model.past_shows_count + count,
+                model.upcoming_shows_count: model.upcoming_shows_count - count
+            }, synchronize_session=False)
+
+    moved = db.session.query(Show).filter(due).update({Show.is_past: True}, synchronize_session=False)
+    db.session.commit()
+    return moved
+
+
+def reconcile(fix=False):
+    # Compares stored counters with counts from the show table. Returns a list
+    # of (model name, id, stored (past, upcoming), actual (past, upcoming)).
+    mismatches = []
+    for model, show_column in COUNTED:
+        actual = {}
+        rows = db.session.query(show_column, Show.is_past, db.func.count(Show.id)) \
+            .group_by(show_column, Show.is_past)
+        for id, is_past, count in rows:
+            past, upcoming = actual.get(id, (0, 0))
+            actual[id] = (past + count, upcoming) if is_past else (past, upcoming + count)
+
+        for id, past, upcoming in db.session.query(model.id, model.past_shows_count, model.upcoming_shows_count):
+            stored = (past, upcoming)
+            expected = actual.get(id, (0, 0))
+            if stored != expected:
+                mismatches.append((model.__name__, id, stored, expected))
+                if fix:
+                    db.session.query(model).filter(model.id == id).update({
+                        model.past_shows_count: expected[0],
+                        model.upcoming_shows_count: expected[1]
+                    }, synchronize_session=False)
+
+    if fix:
+        db.session.commit()
+    return mismatches
+
+
+@click.command("roll-forward-counters")
+@with_appcontext
+def roll_forward_command():
+    """Move shows that have started from upcoming to past counters."""
+    click.echo(f"Moved {roll_forward()} shows to past.")
+
+
+@click.command("reconcile-counters")
+@with_appcontext
+@click.option("--fix", is_flag=True, help="Overwrite mismatched counters.")
+def reconcile_command(fix):
+    """Check stored show counters against the show table."""
+    roll_forward()
+    mismatches = reconcile(fix=fix)
+    for name, id, stored, expected in mismatches:
+        click.echo(f"{name} {id}: stored past/upcoming {stored}, actual {expected}")
+    click.echo(f"{len(mismatches)} mismatched counters" + (" fixed." if fix else "."))
@@ -0,0 +1,160 @@
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+# Streams venues, artists or shows in id order through a server-side cursor,
+# one batch at a time. Exports are resumable: pass the last id received as
+# after_id to pick up where an interrupted export stopped.
+#
+# Formats:
+#   jsonl     one JSON object per line
+#   csv       header row, then one row per record (genres comma-joined)
+#   columnar  b"FYC1", then per batch a 4-byte big-endian length followed by
+#             a zlib-compressed JSON object mapping each column to its values
+
+import csv
+import io
+import json
+import struct
+import sys
+import zlib
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+
+from models import db, Venue, Artist, Show, Genre, artist_genre, venue_genre
+
+BATCH_SIZE = 1000
+
+COLUMNAR_MAGIC = b"FYC1"
+
+EXPORTS = {
+    "venues": (Venue, ("id", "name", "city", "state", "address", "phone", "website",
+                       "facebook_link", "seeking_talent", "seeking_description", "image_link"),
+               (venue_genre, "venue_id")),
+    "artists": (Artist, ("id", "name", "city", "state", "phone", "phone_e164", "website",
+                         "facebook_link", "seeking_venue", "seeking_description", "image_link"),
+                (artist_genre, "artist_id")),
+    "shows": (Show, ("id", "artist_id", "venue_id", "start_time", "end_time"), None),
+}
+
+FORMATS = {
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv",
+    "columnar": "application/octet-stream",
+}
+
+
+def export_columns(kind):
+    model, columns, genres = EXPORTS[kind]
+    return columns + ("genres",) if genres else columns
+
+
+def _genres(link, fk, ids):
+    # Genre names for a batch of ids, in one query
+    names = {}
+    rows = db.session.query(link.c[fk], Genre.name) \
+        .join(Genre, Genre.id == link.c.genre_id) \
+        .filter(link.c[fk].in_(ids)) \
+        .order_by(Genre.name)
+    for id, name in rows:
+        names.setdefault(id, []).append(name)
+    return names
+
+
+def export_batches(kind, after_id=None, batch_size=BATCH_SIZE):
+    # Yields lists of row dicts, batch_size at a time, in id order
+    model, columns, genres = EXPORTS[kind]
+    query = db.session.query(*[getattr(model, name) for name in columns]).order_by(model.id)
+    if after_id is not None:
+        query = query.filter(model.id > after_id)
+    query = query.execution_options(stream_results=True).yield_per(batch_size)
+
+    batch = []
+    for row in query:
+        batch.append(dict(zip(columns, row)))
+        if len(batch) == batch_size:
+            yield _with_genres(batch, genres)
+            batch = []
+    if batch:
+        yield _with_genres(batch, genres)
+
+
+def _with_genres(batch, genres):
+    if genres:
+        names = _genres(*genres, [row["id"] for row in batch])
+        for row in batch:
+            row["genres"] = names.get(row["id"], [])
+    return batch
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+#  Encoders
+#  ----------------------------------------------------------------
+# Each takes the column names and an iterable of batches and yields chunks
+# ready to write or stream.
+
+def encode_jsonl(columns, batches):
+    for batch in batches:
+        yield "".join(
+            json.dumps({key: _value(value) for key, value in row.items()}, separators=(",", ":")) + "\n"
+            for row in batch
+        ).encode()
+
+
+def encode_csv(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        for row in batch:
+            writer.writerow([
+                ",".join(row[column]) if column == "genres" else _value(row[column])
+                for column in columns
+            ])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def encode_columnar(columns, batches):
+    yield COLUMNAR_MAGIC
+    for batch in batches:
+        block = {column: [_value(row[column]) for row in batch] for column in columns}
+        data = zlib.compress(json.dumps(block, separators=(",", ":")).encode())
+        yield struct.pack(">I", len(data)) + data
+
+
+ENCODERS = {
+    "jsonl": encode_jsonl,
+    "csv": encode_csv,
+    "columnar": encode_columnar,
+}
+
+
+def export(kind, format="jsonl", after_id=None, batch_size=BATCH_SIZE):
+    # Yields the encoded export of `kind` as bytes
+    return ENCODERS[format](export_columns(kind), export_batches(kind, after_id, batch_size))
+
+
+@click.command("export")
+@with_appcontext
+@click.argument("kind", type=click.Choice(sorted(EXPORTS)))
+@click.option("--format", "format", type=click.Choice(sorted(ENCODERS)), default="jsonl", show_default=True)
+@click.option("--after-id", type=int, help="Resume after this id.")
+@click.option("--output", type=click.Path(dir_okay=False), help="Defaults to stdout.")
+@click.option("--batch-size", default=BATCH_SIZE, show_default=True)
+def export_command(kind, format, after_id, output, batch_size):
+    """Export venues, artists or shows as JSONL, CSV or columnar batches."""
+    out = open(output, "wb") if output else sys.stdout.buffer
+    try:
+        for chunk in export(kind, format, after_id, batch_size):
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
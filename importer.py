@@ -0,0 +1,282 @@
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+# `flask import <venues|artists|shows> FILE` streams a CSV or JSONL file,
+# validates each row with the same form the create pages use, and inserts
+# valid rows in batches with executemany. Each batch commits on its own and
+# reports the rows it rejected, so one bad row never sinks the whole file.
+
+import csv
+import json
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from werkzeug.datastructures import MultiDict
+
+from models import db, Venue, Artist, Show, Genre, artist_genre, venue_genre
+from forms import VenueForm, ArtistForm, ShowForm
+from phones import normalize_phone
+from counters import count_bulk_shows
+from search import invalidate_index
+from cache import invalidate
+from queries import Bookings, existing_bookings
+
+BATCH_SIZE = 1000
+
+
+#  Reading
+#  ----------------------------------------------------------------
+
+def read_rows(path, format=None):
+    # Yields (line number, dict) for each record in a CSV or JSONL file
+    if format is None:
+        format = "jsonl" if path.endswith((".jsonl", ".json")) else "csv"
+
+    with open(path, newline="", encoding="utf-8") as f:
+        if format == "csv":
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                yield line, row
+        else:
+            for line, text in enumerate(f, start=1):
+                if text.strip():
+                    yield line, json.loads(text)
+
+
+def form_data(row):
+    # Genres may be a list (JSONL) or a comma-joined string (CSV)
+    data = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == "genres":
+            names = value if isinstance(value, list) else value.split(",")
+            for name in names:
+                if name.strip():
+                    data.add(key, name.strip())
+        elif isinstance(value, bool):
+            # BooleanField treats any submitted value as checked
+            if value:
+                data.add(key, "y")
+        else:
+            data.add(key, str(value))
+    return data
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+#  Validation
+#  ----------------------------------------------------------------
+
+def venue_record(form):
+    return {
+        "name": form.name.data,
+        "city": form.city.data,
+        "state": form.state.data,
+        "address": form.address.data,
+        "phone": form.phone.data,
+        "facebook_link": form.facebook_link.data,
+        "image_link": form.image_link.data,
+        "seeking_talent": form.seeking_talent.data,
+        "seeking_description": form.seeking_description.data,
+        "website": form.website_link.data
+    }, form.genres.data
+
+
+def artist_record(form):
+    return {
+        "name": form.name.data,
+        "city": form.city.data,
+        "state": form.state.data,
+        "phone": form.phone.data,
+        "phone_e164": normalize_phone(form.phone.data),
+        "facebook_link": form.facebook_link.data,
+        "image_link": form.image_link.data,
+        "seeking_venue": form.seeking_venue.data,
+        "seeking_description": form.seeking_description.data,
+        "website": form.website_link.data
+    }, form.genres.data
+
+
+def show_record(form):
+    try:
+        artist_id, venue_id = int(form.artist_id.data), int(form.venue_id.data)
+    except (TypeError, ValueError):
+        raise ValueError({"artist_id/venue_id": ["Must be integer ids."]})
+    return {
+        "artist_id": artist_id,
+        "venue_id": venue_id,
+        "start_time": form.start_time.data,
+        "end_time": form.start_time.data + timedelta(minutes=form.duration.data)
+    }, None
+
+
+def validate(form_class, record, batch):
+    # Returns (records, errors) for a batch of (line, row) pairs
+    records, errors = [], []
+    for line, row in batch:
+        form = form_class(formdata=form_data(row), meta={"csrf": False})
+        if not form.validate():
+            errors.append((line, form.errors))
+            continue
+        try:
+            records.append((line, record(form)))
+        except ValueError as e:
+            errors.append((line, e.args[0]))
+    return records, errors
+
+
+#  Inserting
+#  ----------------------------------------------------------------
+
+def reserve_ids(model, count):
+    # Returns `count` new ids for model in one round trip, so the rows can go
+    # in with a single executemany and still be linked to their genres
+    table = model.__tablename__
+    if db.engine.dialect.name == "postgresql":
+        return db.session.execute(db.text(
+            f"SELECT nextval(pg_get_serial_sequence('{table}', 'id')) FROM generate_series(1, :count)"
+        ), {"count": count}).scalars().all()
+    # No sequences (SQLite test databases): continue from the highest id
+    first = (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+    return list(range(first, first + count))
+
+
+def insert_with_genres(model, link_table, fk, records):
+    rows = [row for _, (row, _) in records]
+    for row, id in zip(rows, reserve_ids(model, len(rows))):
+        row["id"] = id
+    db.session.execute(model.__table__.insert(), rows)
+
+    names = {name for _, (_, genres) in records for name in genres}
+    genres = Genre.from_names(names)
+    db.session.add_all(genres)
+    db.session.flush()
+    genre_ids = {genre.name: genre.id for genre in genres}
+
+    links = [
+        {fk: row["id"], "genre_id": genre_ids[name]}
+        for _, (row, names) in records
+        for name in dict.fromkeys(names)
+    ]
+    if links:
+        db.session.execute(link_table.insert(), links)
+    invalidate_index(model)
+
+
+def insert_venues(records):
+    insert_with_genres(Venue, venue_genre, "venue_id", records)
+
+
+def insert_artists(records):
+    insert_with_genres(Artist, artist_genre, "artist_id", records)
+
+
+def insert_shows(records):
+    rows = [row for _, (row, _) in records]
+    now = datetime.now()
+    for row in rows:
+        row["is_past"] = row["start_time"] <= now
+    db.session.execute(Show.__table__.insert(), rows)
+    count_bulk_shows(db.session.connection(), rows)
+    invalidate(venue_ids={row["venue_id"] for row in rows},
+               artist_ids={row["artist_id"] for row in rows})
+
+
+def check_show_references(records, errors):
+    # Rejects shows pointing at missing artists or venues, or overlapping an
+    # existing booking or an earlier show in the file, before they can fail
+    # the whole batch on a constraint. Existing bookings of the batch's venues
+    # and artists come from one query over the batch's time span.
+    artist_ids = {row["artist_id"] for _, (row, _) in records}
+    venue_ids = {row["venue_id"] for _, (row, _) in records}
+    known_artists = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+    known_venues = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+    existing = existing_bookings(known_venues, known_artists,
+                                 min(row["start_time"] for _, (row, _) in records),
+                                 max(row["end_time"] for _, (row, _) in records))
+    in_file = Bookings()
+
+    checked = []
+    for line, (row, extra) in records:
+        keys = (("venue", row["venue_id"]), ("artist", row["artist_id"]))
+        times = row["start_time"], row["end_time"]
+        if row["artist_id"] not in known_artists:
+            errors.append((line, {"artist_id": ["No such artist."]}))
+        elif row["venue_id"] not in known_venues:
+            errors.append((line, {"venue_id": ["No such venue."]}))
+        elif any(in_file.overlaps(key, *times) for key in keys):
+            errors.append((line, {"start_time": ["Overlaps another show in this file."]}))
+        else:
+            conflict = next((kind for kind, id in keys if existing.overlaps((kind, id), *times)), None)
+            if conflict:
+                errors.append((line, {"start_time": [f"The {conflict} is already booked at that time."]}))
+            else:
+                for key in keys:
+                    in_file.add(key, *times)
+                checked.append((line, (row, extra)))
+    return checked
+
+
+IMPORTERS = {
+    "venues": (VenueForm, venue_record, insert_venues),
+    "artists": (ArtistForm, artist_record, insert_artists),
+    "shows": (ShowForm, show_record, insert_shows),
+}
+
+
+def import_file(kind, path, format=None, batch_size=BATCH_SIZE):
+    # Yields a report dict per batch: inserted count, rejected (line, errors)
+    # pairs, and the batch error if its insert failed as a whole
+    form_class, record, insert = IMPORTERS[kind]
+
+    for number, batch in enumerate(batches(read_rows(path, format), batch_size), start=1):
+        records, errors = validate(form_class, record, batch)
+        if kind == "shows" and records:
+            records = check_show_references(records, errors)
+
+        report = {"batch": number, "inserted": 0, "rejected": errors, "error": None}
+        if records:
+            try:
+                insert(records)
+                db.session.commit()
+                report["inserted"] = len(records)
+            except Exception as e:
+                db.session.rollback()
+                report["error"] = str(e)
+        yield report
+
+
+@click.command("import")
+@with_appcontext
+@click.argument("kind", type=click.Choice(sorted(IMPORTERS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension.")
+@click.option("--batch-size", default=BATCH_SIZE, show_default=True)
+def import_command(kind, path, format, batch_size):
+    """Bulk import venues, artists or shows from a CSV or JSONL file."""
+    started = time.perf_counter()
+    inserted = rejected = 0
+
+    for report in import_file(kind, path, format, batch_size):
+        inserted += report["inserted"]
+        rejected += len(report["rejected"])
+        click.echo(f"batch {report['batch']}: {report['inserted']} inserted, {len(report['rejected'])} rejected")
+        for line, errors in report["rejected"]:
+            click.echo(f"  line {line}: {errors}", err=True)
+        if report["error"]:
+            click.echo(f"  batch failed: {report['error']}", err=True)
+
+    elapsed = time.perf_counter() - started
+    rate = inserted / elapsed if elapsed else 0
+    click.echo(f"{inserted} {kind} inserted, {rejected} rejected in {elapsed:.1f}s ({rate:.0f} rows/s)")
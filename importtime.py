@@ -0,0 +1,67 @@
+#----------------------------------------------------------------------------#
+# Import-time budget.
+#----------------------------------------------------------------------------#
+# Measures how long a fresh interpreter takes to import the app and build it
+# with create_app(), using `python -X importtime`, and lists the slowest
+# modules. Exits with status 1 when the total is over budget, so it can run
+# as a CI step:
+#
+#   python importtime.py --budget 1000 --top 15
+#
+# Timings vary between machines; take the budget from a run on the CI host.
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Milliseconds for `import app; app.create_app()`
+IMPORT_BUDGET_MS = 1000
+
+STARTUP = (
+    "import time; started = time.perf_counter(); "
+    "import app; app.create_app(); "
+    "print(round((time.perf_counter() - started) * 1000, 1))"
+)
+
+
+def measure():
+    # Returns (total ms, [(cumulative ms, self ms, module)] for every import)
+    # The testing config needs no secrets or database server to build the app
+    env = dict(os.environ)
+    env.setdefault("FLASK_ENV", "testing")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", STARTUP],
+        capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|")
+        imports.append((int(cumulative) / 1000, int(own) / 1000, module.rstrip()))
+    return float(result.stdout.split()[-1]), imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_MS, help="Budget in milliseconds.")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to list.")
+    args = parser.parse_args()
+
+    total, imports = measure()
+    print(f"{'cumulative':>11} {'self':>9}  module")
+    for cumulative, own, module in sorted(imports, reverse=True)[:args.top]:
+        print(f"{cumulative:9.1f}ms {own:7.1f}ms  {module}")
+    print(f"\nimport app + create_app(): {total:.1f} ms (budget {args.budget:.0f} ms)")
+
+    if total > args.budget:
+        print("Over budget.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#----------------------------------------------------------------------------#
+# Load test.
+#----------------------------------------------------------------------------#
+# Drives a running server with concurrent clients and reports requests per
+# second and latency percentiles per route. Seed the database first
+# (`flask seed --shows 100000`), start the app, then e.g.
+#
+#   python loadtest.py http://localhost:5000 --clients 16 --duration 30 --workers 4 --output before.json
+#
+# The /async/ routes go to the ASGI app (asgi.py), at --async-base if it
+# isn't proxied under the same host. --workers is the number of server
+# worker processes, used to report requests per second per worker.
+#
+# Compare two runs with `python loadtest.py --compare before.json after.json`.
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# (name, method, path, form data); {venue}/{artist} are filled with random ids
+ROUTES = [
+    ("index", "GET", "/", None),
+    ("venues", "GET", "/venues", None),
+    ("artists", "GET", "/artists", None),
+    ("artists_by_genre", "GET", "/artists?genre=Jazz", None),
+    ("shows", "GET", "/shows", None),
+    ("show_venue", "GET", "/venues/{venue}", None),
+    ("show_artist", "GET", "/artists/{artist}", None),
+    ("search_venues", "POST", "/venues/search", {"search_term": "hall"}),
+    ("search_artists", "POST", "/artists/search", {"search_term": "band"}),
+    ("edit_venue", "GET", "/venues/{venue}/edit", None),
+    ("edit_artist", "GET", "/artists/{artist}/edit", None),
+    ("create_venue_form", "GET", "/venues/create", None),
+    ("create_artist_form", "GET", "/artists/create", None),
+    ("create_show_form", "GET", "/shows/create", None),
+    ("api_venues", "GET", "/api/v1/venues", None),
+    ("api_artists", "GET", "/api/v1/artists", None),
+    ("api_shows", "GET", "/api/v1/shows", None),
+    ("api_venue", "GET", "/api/v1/venues/{venue}", None),
+    ("api_artist", "GET", "/api/v1/artists/{artist}", None),
+    ("async_search_venues", "GET", "/async/venues/search?search_term=hall", None),
+    ("async_search_artists", "GET", "/async/artists/search?search_term=band", None),
+    ("async_search", "GET", "/async/search?search_term=blue", None),
+]
+
+ASYNC_PREFIX = "/async/"
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def request(base, method, path, data, max_ids):
+    path = path.format(venue=random.randint(1, max_ids), artist=random.randint(1, max_ids))
+    body = urllib.parse.urlencode(data).encode() if data else None
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(base + path, data=body, method=method)) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except urllib.error.URLError:
+        status = 0
+    return time.perf_counter() - started, status
+
+
+def run(base, async_base, routes, clients, duration, max_ids, workers):
+    results = {name: {"latencies": [], "errors": 0} for name, *_ in routes}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        while time.monotonic() < deadline:
+            name, method, path, data = random.choice(routes)
+            target = async_base if path.startswith(ASYNC_PREFIX) else base
+            seconds, status = request(target, method, path, data, max_ids)
+            with lock:
+                results[name]["latencies"].append(seconds)
+                if status == 0 or status >= 500:
+                    results[name]["errors"] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = {}
+    for name, result in results.items():
+        latencies = sorted(result["latencies"])
+        report[name] = {
+            "requests": len(latencies),
+            "errors": result["errors"],
+            "rps": len(latencies) / duration,
+            "rps_per_worker": len(latencies) / duration / workers,
+            "p50_ms": percentile(latencies, 50) and percentile(latencies, 50) * 1000,
+            "p90_ms": percentile(latencies, 90) and percentile(latencies, 90) * 1000,
+            "p99_ms": percentile(latencies, 99) and percentile(latencies, 99) * 1000,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'route':<22} {'reqs':>7} {'err':>5} {'rps':>8} {'rps/wkr':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    for name, row in report.items():
+        cells = [f"{row[key]:.1f}" if row.get(key) is not None else "-"
+                 for key in ("rps", "rps_per_worker", "p50_ms", "p90_ms", "p99_ms")]
+        print(f"{name:<22} {row['requests']:>7} {row['errors']:>5} " + " ".join(f"{cell:>8}" for cell in cells))
+
+
+def compare(before, after):
+    print(f"{'route':<22} {'rps':>17} {'rps/worker':>17} {'p99 ms':>17}")
+    for name in before:
+        if name not in after:
+            continue
+        a, b = before[name], after[name]
+        # Reports written before --workers existed count as one worker
+        a_per_worker, b_per_worker = (row.get("rps_per_worker", row["rps"]) for row in (a, b))
+        print(f"{name:<22} {a['rps']:>8.1f}→{b['rps']:<8.1f} "
+              f"{a_per_worker:>8.1f}→{b_per_worker:<8.1f} "
+              f"{(a['p99_ms'] or 0):>8.1f}→{(b['p99_ms'] or 0):<8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base", nargs="?", default="http://localhost:5000")
+    parser.add_argument("--async-base", help="base URL of the ASGI app (default: base)")
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--max-id", type=int, default=1000, help="highest venue/artist id to request")
+    parser.add_argument("--routes", help="comma separated route names (default: all)")
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        before, after = (json.load(open(path)) for path in args.compare)
+        compare(before, after)
+        return
+
+    routes = ROUTES
+    if args.routes:
+        wanted = set(args.routes.split(","))
+        routes = [route for route in ROUTES if route[0] in wanted]
+    base = args.base.rstrip("/")
+    report = run(base, (args.async_base or base).rstrip("/"), routes,
+                 args.clients, args.duration, args.max_id, args.workers)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
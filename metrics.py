@@ -0,0 +1,198 @@
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+# Prometheus metrics served at /metrics. With several worker processes, set
+# PROMETHEUS_MULTIPROC_DIR to an empty directory before starting them: each
+# worker then writes its samples to mmap-backed files there and /metrics sums
+# them across workers. (Under gunicorn, also call
+# prometheus_client.multiprocess.mark_process_dead(worker.pid) from the
+# child_exit hook.)
+#
+# The per-request cost is a perf_counter() call, a gauge inc/dec and one
+# counter and histogram update on pre-bound label children. `python
+# metrics.py` measures it.
+
+import os
+import time
+
+from flask import g, request, Response
+from prometheus_client import (Counter, Histogram, Gauge, CollectorRegistry, REGISTRY,
+                               generate_latest, CONTENT_TYPE_LATEST, multiprocess)
+
+from routing import pool_stats
+
+REQUESTS = Counter(
+    "fyyur_requests_total", "Requests handled, by endpoint, method and status.",
+    ["endpoint", "method", "status"]
+)
+LATENCY = Histogram(
+    "fyyur_request_duration_seconds", "Request latency, by endpoint.",
+    ["endpoint"],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+)
+IN_FLIGHT = Gauge(
+    "fyyur_requests_in_flight", "Requests currently being handled.",
+    multiprocess_mode="livesum"
+)
+PAGE_CACHE = Counter(
+    "fyyur_page_cache_requests_total", "Page cache lookups, by result (hit or miss).",
+    ["result"]
+)
+# Pool statistics, per engine. PoolStats keeps running totals, which are
+# exported as counters so they add up across workers and survive restarts in
+# rate(); the longest wait is a per-worker high-water mark, so workers are
+# combined with max; only the live QueuePool gauges (size, checkedout,
+# overflow, checkedin) are summed over live workers.
+POOL_COUNTERS = {
+    "checkouts": Counter(
+        "fyyur_db_pool_checkouts_total", "Connections checked out of the pool, by engine.",
+        ["engine"]
+    ),
+    "wait_seconds": Counter(
+        "fyyur_db_pool_wait_seconds_total", "Time spent waiting for a pooled connection, by engine.",
+        ["engine"]
+    ),
+    "timeouts": Counter(
+        "fyyur_db_pool_timeouts_total", "Checkouts that failed or timed out, by engine.",
+        ["engine"]
+    ),
+}
+DB_POOL_MAX_WAIT = Gauge(
+    "fyyur_db_pool_max_wait_seconds", "Longest wait for a pooled connection, by engine.",
+    ["engine"],
+    multiprocess_mode="max"
+)
+DB_POOL = Gauge(
+    "fyyur_db_pool", "Connection pool occupancy, by engine and statistic.",
+    ["engine", "stat"],
+    multiprocess_mode="livesum"
+)
+
+# Pool gauges are refreshed at most this often per process
+POOL_REFRESH_SECONDS = 1.0
+
+_latency_children = {}
+_request_children = {}
+_pool_refreshed = 0.0
+# Running totals already added to POOL_COUNTERS, by (engine, stat)
+_pool_counted = {}
+
+
+def _latency(endpoint):
+    child = _latency_children.get(endpoint)
+    if child is None:
+        child = _latency_children[endpoint] = LATENCY.labels(endpoint)
+    return child
+
+
+def _requests(endpoint, method, status):
+    key = (endpoint, method, status)
+    child = _request_children.get(key)
+    if child is None:
+        child = _request_children[key] = REQUESTS.labels(*key)
+    return child
+
+
+def refresh_pool_gauges():
+    global _pool_refreshed
+    now = time.monotonic()
+    if now - _pool_refreshed < POOL_REFRESH_SECONDS:
+        return
+    _pool_refreshed = now
+    for engine, stats in pool_stats().items():
+        for stat, value in stats.items():
+            counter = POOL_COUNTERS.get(stat)
+            if counter is not None:
+                counted = _pool_counted.get((engine, stat), 0)
+                # A total below what was counted means the engine was
+                # recreated under the same URL and its stats started over
+                counter.labels(engine).inc(value - counted if value >= counted else value)
+                _pool_counted[engine, stat] = value
+            elif stat == "max_wait_seconds":
+                DB_POOL_MAX_WAIT.labels(engine).set(value)
+            else:
+                DB_POOL.labels(engine, stat).set(value)
+
+
+def registry():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ or "prometheus_multiproc_dir" in os.environ:
+        collected = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collected)
+        return collected
+    return REGISTRY
+
+
+def init_metrics(app):
+
+    @app.before_request
+    def start_request():
+        g.metrics_started = time.perf_counter()
+        g.metrics_in_flight = True
+        IN_FLIGHT.inc()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            _latency(endpoint).observe(time.perf_counter() - started)
+            _requests(endpoint, request.method, response.status_code).inc()
+        refresh_pool_gauges()
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        if g.pop("metrics_in_flight", False):
+            IN_FLIGHT.dec()
+
+    @app.route('/metrics')
+    def metrics():
+        refresh_pool_gauges()
+        return Response(generate_latest(registry()), mimetype=CONTENT_TYPE_LATEST)
+
+
+#  Benchmark
+#  ----------------------------------------------------------------
+
+def benchmark(requests=20000, repeat=5):
+    import timeit
+    from flask import Flask
+
+    def make_app(with_metrics):
+        app = Flask(__name__)
+        if with_metrics:
+            init_metrics(app)
+        app.add_url_rule("/ping", "ping", lambda: "pong")
+        return app
+
+    bare, measured = make_app(False), make_app(True)
+
+    # The three hooks alone, inside one request context
+    hooks = (measured.before_request_funcs[None], measured.after_request_funcs[None],
+             measured.teardown_request_funcs[None])
+    response = Response("pong")
+    with measured.test_request_context("/ping"):
+        def run_hooks():
+            for before in hooks[0]:
+                before()
+            for after in hooks[1]:
+                after(response)
+            for teardown in hooks[2]:
+                teardown(None)
+        hooks_seconds = min(timeit.repeat(run_hooks, number=requests, repeat=repeat))
+
+    # Whole requests through the test client, with and without the hooks
+    def served(app):
+        client = app.test_client()
+        return min(timeit.repeat(lambda: client.get("/ping"), number=requests // 10, repeat=repeat)) / (requests // 10)
+
+    bare_seconds, measured_seconds = served(bare), served(measured)
+    print(f"best of {repeat}")
+    print(f"  metrics hooks alone       {hooks_seconds / requests * 1e6:8.2f} us/request")
+    print(f"  request without metrics   {bare_seconds * 1e6:8.2f} us")
+    print(f"  request with metrics      {measured_seconds * 1e6:8.2f} us "
+          f"(+{(measured_seconds - bare_seconds) / bare_seconds:.1%})")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,105 @@
+"""normalized genre tables
+
+Revision ID: 01a661a6a905
+Revises: b4835ae6fbf9
+Create Date: 2026-10-18 10:02:17.845519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '01a661a6a905'
+down_revision = 'b4835ae6fbf9'
+branch_labels = None
+depends_on = None
+
+
+genre = sa.table('genre',
+    sa.column('id', sa.Integer),
+    sa.column('name', sa.String)
+)
+
+# (entity table, association table, foreign key column)
+LINKS = [
+    ('artist', 'artist_genre', 'artist_id'),
+    ('venue', 'venue_genre', 'venue_id'),
+]
+
+
+def upgrade():
+    op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, link, fk in LINKS:
+        op.create_table(link,
+        sa.Column(fk, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([fk], [f'{table}.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(fk, 'genre_id')
+        )
+        op.create_index(f'ix_{link}_genre_id', link, ['genre_id', fk], unique=False)
+
+    # Backfill from the comma-joined strings
+    bind = op.get_bind()
+    rows = {
+        table: bind.execute(sa.text(f'SELECT id, genres FROM {table}')).fetchall()
+        for table, _, _ in LINKS
+    }
+    names = sorted({
+        name.strip()
+        for table_rows in rows.values()
+        for _, genres in table_rows
+        for name in (genres or '').split(',')
+        if name.strip()
+    })
+    if names:
+        op.bulk_insert(genre, [{'name': name} for name in names])
+    genre_ids = dict((name, id) for id, name in bind.execute(sa.text('SELECT id, name FROM genre')))
+
+    for table, link, fk in LINKS:
+        link_table = sa.table(link, sa.column(fk, sa.Integer), sa.column('genre_id', sa.Integer))
+        links = {
+            (id, genre_ids[name.strip()])
+            for id, genres in rows[table]
+            for name in (genres or '').split(',')
+            if name.strip()
+        }
+        if links:
+            op.bulk_insert(link_table, [{fk: id, 'genre_id': genre_id} for id, genre_id in sorted(links)])
+
+    op.drop_column('artist', 'genres')
+    op.drop_column('venue', 'genres')
+
+
+def downgrade():
+    op.add_column('venue', sa.Column('genres', sa.VARCHAR(), autoincrement=False, nullable=True))
+    op.add_column('artist', sa.Column('genres', sa.VARCHAR(length=120), autoincrement=False, nullable=True))
+
+    # Fold the association rows back into comma-joined strings
+    bind = op.get_bind()
+    for table, link, fk in LINKS:
+        genres = {}
+        for id, name in bind.execute(sa.text(
+                f'SELECT {link}.{fk}, genre.name FROM {link} '
+                f'JOIN genre ON genre.id = {link}.genre_id ORDER BY genre.name')):
+            genres.setdefault(id, []).append(name)
+        for id, names in genres.items():
+            bind.execute(
+                sa.text(f'UPDATE {table} SET genres = :genres WHERE id = :id'),
+                genres=','.join(names), id=id
+            )
+        bind.execute(sa.text(f"UPDATE {table} SET genres = '' WHERE genres IS NULL"))
+
+    op.alter_column('venue', 'genres', existing_type=sa.VARCHAR(), nullable=False)
+    op.alter_column('artist', 'genres', existing_type=sa.VARCHAR(length=120), nullable=False)
+
+    for table, link, fk in LINKS:
+        op.drop_index(f'ix_{link}_genre_id', table_name=link)
+        op.drop_table(link)
+    op.drop_table('genre')
@@ -0,0 +1,51 @@
+"""maintained show counters
+
+Revision ID: 2a8ca7721d7a
+Revises: de58f7ba4eaa
+Create Date: 2026-10-18 12:03:44.190562
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a8ca7721d7a'
+down_revision = 'de58f7ba4eaa'
+branch_labels = None
+depends_on = None
+
+
+# (table, show foreign key column)
+COUNTED = [('venue', 'venue_id'), ('artist', 'artist_id')]
+
+
+def upgrade():
+    op.add_column('show', sa.Column('is_past', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.alter_column('show', 'is_past', server_default=None)
+    op.create_index('ix_show_is_past_start_time', 'show', ['is_past', 'start_time'], unique=False)
+    op.add_column('artist', sa.Column('past_shows_count', sa.Integer(), nullable=True))
+    op.add_column('artist', sa.Column('upcoming_shows_count', sa.Integer(), nullable=True))
+
+    # Backfill from the show table; start_time is stored in local time
+    bind = op.get_bind()
+    bind.execute(sa.text('UPDATE show SET is_past = (start_time <= :now)'), now=datetime.now())
+    for table, fk in COUNTED:
+        bind.execute(sa.text(
+            f'UPDATE {table} SET '
+            f'past_shows_count = (SELECT count(*) FROM show WHERE show.{fk} = {table}.id AND show.is_past), '
+            f'upcoming_shows_count = (SELECT count(*) FROM show WHERE show.{fk} = {table}.id AND NOT show.is_past)'
+        ))
+        op.alter_column(table, 'past_shows_count', existing_type=sa.Integer(), nullable=False)
+        op.alter_column(table, 'upcoming_shows_count', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade():
+    op.alter_column('venue', 'upcoming_shows_count', existing_type=sa.Integer(), nullable=True)
+    op.alter_column('venue', 'past_shows_count', existing_type=sa.Integer(), nullable=True)
+    op.drop_column('artist', 'upcoming_shows_count')
+    op.drop_column('artist', 'past_shows_count')
+    op.drop_index('ix_show_is_past_start_time', table_name='show')
+    op.drop_column('show', 'is_past')
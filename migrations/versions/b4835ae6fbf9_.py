@@ -0,0 +1,48 @@
+"""trigram search indexes
+
+Revision ID: b4835ae6fbf9
+Revises: a34bc0c69414
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4835ae6fbf9'
+down_revision = 'a34bc0c69414'
+branch_labels = None
+depends_on = None
+
+
+# Columns searched with ILIKE '%term%' by search_venues / search_artists
+SEARCH_COLUMNS = {
+    'venue': ['name', 'city', 'state'],
+    'artist': ['name', 'city', 'state'],
+}
+
+
+def upgrade():
+    # pg_trgm GIN indexes only exist on Postgres; other databases use the
+    # in-process fallback index in search.py
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, columns in SEARCH_COLUMNS.items():
+        for column in columns:
+            op.create_index(
+                f'ix_{table}_{column}_trgm', table, [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'}
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, columns in SEARCH_COLUMNS.items():
+        for column in columns:
+            op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
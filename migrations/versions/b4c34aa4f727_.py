@@ -0,0 +1,45 @@
+"""show end_time and overlap exclusion constraints
+
+Revision ID: b4c34aa4f727
+Revises: 2a8ca7721d7a
+Create Date: 2026-10-18 14:37:20.552871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4c34aa4f727'
+down_revision = '2a8ca7721d7a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # Existing shows are assumed to last the form's default of two hours.
+    # If any of them overlap, creating the constraints below fails and the
+    # conflicting rows have to be fixed by hand first.
+    op.execute("UPDATE show SET end_time = start_time + interval '2 hours'")
+    op.alter_column('show', 'end_time', existing_type=sa.DateTime(), nullable=False)
+    op.create_check_constraint('ck_show_end_after_start', 'show', 'end_time > start_time')
+
+    # GiST exclusion constraints reject overlapping bookings of the same venue
+    # or artist in the database, with an index lookup per insert
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(
+        'ALTER TABLE show ADD CONSTRAINT ex_show_venue_overlap '
+        'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)'
+    )
+    op.execute(
+        'ALTER TABLE show ADD CONSTRAINT ex_show_artist_overlap '
+        'EXCLUDE USING gist (artist_id WITH =, tsrange(start_time, end_time) WITH &&)'
+    )
+
+
+def downgrade():
+    op.drop_constraint('ex_show_artist_overlap', 'show')
+    op.drop_constraint('ex_show_venue_overlap', 'show')
+    op.drop_constraint('ck_show_end_after_start', 'show', type_='check')
+    op.drop_column('show', 'end_time')
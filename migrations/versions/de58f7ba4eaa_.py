@@ -0,0 +1,34 @@
+"""updated_at columns
+
+Revision ID: de58f7ba4eaa
+Revises: 50886e48aa7e
+Create Date: 2026-10-18 11:26:08.615390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'de58f7ba4eaa'
+down_revision = '50886e48aa7e'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ['venue', 'artist', 'show']
+
+
+def upgrade():
+    for table in TABLES:
+        # Existing rows start out as modified at migration time
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text("(now() at time zone 'utc')")))
+        op.alter_column(table, 'updated_at', server_default=None)
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,59 @@
+"""artist phone_e164
+
+Revision ID: e08615a1a63d
+Revises: b4c34aa4f727
+Create Date: 2026-10-18 15:02:11.304518
+
+"""
+import functools
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e08615a1a63d'
+down_revision = 'b4c34aa4f727'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 1000
+MAX_PHONE_LENGTH = 50
+
+
+# Frozen copy of phones.normalize_phone as of this revision, so later changes
+# to the app's normalizer don't change what this migration writes
+@functools.lru_cache(maxsize=65536)
+def normalize_phone(raw):
+    import phonenumbers
+    if not raw or len(raw) > MAX_PHONE_LENGTH:
+        return None
+    try:
+        number = phonenumbers.parse(raw)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_valid_number(number):
+        return None
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def upgrade():
+    op.add_column('artist', sa.Column('phone_e164', sa.String(length=16), nullable=True))
+
+    # Existing numbers are normalized once here; invalid ones stay NULL
+    artist = sa.table('artist', sa.column('id'), sa.column('phone'), sa.column('phone_e164'))
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(artist.c.id, artist.c.phone)).fetchall()
+    update = artist.update().where(artist.c.id == sa.bindparam('artist_id')) \
+        .values(phone_e164=sa.bindparam('e164'))
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = [{'artist_id': id, 'e164': normalize_phone(phone)} for id, phone in rows[start:start + BATCH_SIZE]]
+        conn.execute(update, batch)
+
+    op.create_index('ix_artist_phone_e164', 'artist', ['phone_e164'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artist_phone_e164', table_name='artist')
+    op.drop_column('artist', 'phone_e164')
@@ -2,45 +2,54 @@
 # Models.
 #----------------------------------------------------------------------------#
 
-from enum import unique
-import json
-import sys
-import dateutil.parser
-import babel
-from flask import Flask, jsonify, render_template, request, Response, flash, redirect, url_for
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
+from datetime import datetime
 
-
-from flask_script import Manager
-from flask_migrate import Migrate, MigrateCommand
-
-from flask_wtf.csrf import CSRFProtect,  CSRFError
+from flask_wtf.csrf import CSRFProtect
+from sqlalchemy import event
+from routing import RoutingSQLAlchemy
 
 
 #----------------------------------------------------------------------------#
-# App Config.
+# Extensions.
 #----------------------------------------------------------------------------#
+# Created unbound; create_app() in app.py binds them to the app it builds.
+
+db = RoutingSQLAlchemy() # routes read-only views to replicas, see routing.py
 
-app = Flask(__name__)
+# Enable CSRF protection globally for a Flask app.
+csrf = CSRFProtect()
 
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
 
-#To create local postgresql database connection
-manager = Manager(app)
-manager.add_command('db', MigrateCommand)
+# Genres are stored once in `genre` and linked through association tables,
+# so that filtering by genre is an index lookup rather than a string scan.
+artist_genre = db.Table('artist_genre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genre_genre_id', 'genre_id', 'artist_id')
+)
+
+venue_genre = db.Table('venue_genre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genre_genre_id', 'genre_id', 'venue_id')
+)
 
-# Enable CSRF protection globally for a Flask app.
-csrf = CSRFProtect(app)
 
-# (*) TODO: connect to a local postgresql database
-migrate = Migrate(app, db) #Initializing migrate
+class Genre(db.Model):
+    __tablename__ = 'genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @classmethod
+    def from_names(cls, names):
+        # Returns Genre rows for the given names, creating any that don't exist yet
+        names = list(dict.fromkeys(names))
+        existing = {genre.name: genre for genre in cls.query.filter(cls.name.in_(names))}
+        return [existing.get(name) or cls(name=name) for name in names]
+
+    def __repr__(self):
+        return f"<Genre id={self.id} name={self.name}>"
 
 
 class Venue(db.Model):
@@ -48,7 +57,7 @@ class Venue(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.String, nullable=False)
+    genres = db.relationship("Genre", secondary=venue_genre, lazy="select", order_by="Genre.name")
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
@@ -58,9 +67,12 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String(500))
     image_link = db.Column(db.String(500))
-    shows = db.relationship("Show", backref="venues", lazy=False, cascade="all, delete-orphan")
-    past_shows_count = db.Column(db.Integer)
-    upcoming_shows_count = db.Column(db.Integer)
+    # Shows are not hydrated by default; views opt in per query (see loading policies in queries.py)
+    shows = db.relationship("Show", backref="venues", lazy="select", cascade="all, delete-orphan")
+    # Maintained by counters.py
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     def __repr__(self):
         return f"<Venue id={self.id} name={self.name} city={self.city} state={self.city} address={self.address} phone={self.phone} genres={self.genres} facebook_link={self.facebook_link} website={self.website} seeking_talent={self.seeking_talent} seeking_description={self.seeking_description}> \n"
@@ -73,16 +85,23 @@ class Artist(db.Model):
 
     id = db.Column(db.Integer, primary_key=True, unique=True)
     name = db.Column(db.String, nullable=False)
-    genres = db.Column(db.String(120), nullable=False)
+    genres = db.relationship("Genre", secondary=artist_genre, lazy="select", order_by="Genre.name")
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
+    # E.164 form of phone, see phones.py
+    phone_e164 = db.Column(db.String(16), index=True)
     website = db.Column(db.String(120))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String(500))
     image_link = db.Column(db.String(500), nullable=False)
-    shows = db.relationship("Show", backref="artists", lazy=False, cascade="all, delete-orphan")   
+    # Maintained by counters.py
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Shows are not hydrated by default; views opt in per query (see loading policies in queries.py)
+    shows = db.relationship("Show", backref="artists", lazy="select", cascade="all, delete-orphan")
     db.UniqueConstraint('name', name='uix_1')
 
     # (*) TODO: implement any missing fields, as a database migration using Flask-Migrate
@@ -93,12 +112,34 @@ class Artist(db.Model):
 # (*) TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 class Show(db.Model):
     __tablename__ = "show"
+    # Detail pages filter on venue/artist and split on start_time; /shows orders by start_time
+    __table_args__ = (
+        db.Index("ix_show_venue_id_start_time", "venue_id", "start_time"),
+        db.Index("ix_show_artist_id_start_time", "artist_id", "start_time"),
+        db.Index("ix_show_start_time", "start_time"),
+        db.Index("ix_show_is_past_start_time", "is_past", "start_time"),
+        db.CheckConstraint("end_time > start_time", name="ck_show_end_after_start"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey("artist.id"), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey("venue.id"), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Overlapping bookings of a venue or an artist are rejected by exclusion
+    # constraints on Postgres (see migrations) and by booking_conflict() in queries.py
+    end_time = db.Column(db.DateTime, nullable=False)
+    # Whether the show is counted in past_shows_count, see counters.py
+    is_past = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     def __repr__(self):
         return f"<Show id={self.id} artist_id={self.artist_id} venue_id={self.venue_id} artist_image_link={self.artist_image_link} start_time={self.start_time}> \n"
 
+
+# Relationship-only edits (e.g. changing an artist's genres) don't UPDATE the
+# row itself, so onupdate alone would miss them.
+@event.listens_for(db.session, "before_flush")
+def touch_updated_at(session, flush_context, instances):
+    for instance in session.dirty:
+        if isinstance(instance, (Venue, Artist, Show)) and session.is_modified(instance):
+            instance.updated_at = datetime.utcnow()
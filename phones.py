@@ -0,0 +1,91 @@
+#----------------------------------------------------------------------------#
+# Phone numbers.
+#----------------------------------------------------------------------------#
+# Artist phone numbers are validated with phonenumbers and stored twice: as
+# typed (Artist.phone) and in E.164 form (Artist.phone_e164), so reads and
+# duplicate checks compare the stored string instead of parsing again.
+#
+# phonenumbers is imported on the first validation rather than at startup;
+# it keeps the region metadata it loads for the rest of the process. Results
+# are memoized per distinct input, since bulk imports see the same numbers
+# many times.
+#
+# `python phones.py` benchmarks validating 100k numbers against the previous
+# validator, which parsed every submission from scratch.
+
+import functools
+import random
+import timeit
+
+MAX_PHONE_LENGTH = 50
+
+# Distinct inputs kept normalized
+PHONE_CACHE_SIZE = 65536
+
+
+@functools.lru_cache(maxsize=PHONE_CACHE_SIZE)
+def normalize_phone(raw):
+    # Returns raw in E.164 form (e.g. '+14155552671'), or None if it isn't a
+    # valid number. Numbers must carry their country code.
+    import phonenumbers
+    if not raw or len(raw) > MAX_PHONE_LENGTH:
+        return None
+    try:
+        number = phonenumbers.parse(raw)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_valid_number(number):
+        return None
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+#  Benchmark
+#  ----------------------------------------------------------------
+
+def previous_validate(raw):
+    # The ArtistForm validator as it was before this module
+    import phonenumbers
+    try:
+        number = phonenumbers.parse(raw)
+        if len(raw) > MAX_PHONE_LENGTH:
+            return False
+        return phonenumbers.is_valid_number(number)
+    except phonenumbers.NumberParseException:
+        return False
+
+
+def sample_numbers(count, distinct, seed=0):
+    # `count` US numbers drawn from `distinct` different ones, in mixed formats
+    rng = random.Random(seed)
+    formats = ["+1 {a} {e} {n}", "+1 ({a}) {e}-{n}", "+1{a}{e}{n}", "+1-{a}-{e}-{n}"]
+    pool = [
+        rng.choice(formats).format(a=rng.choice(["212", "415", "512", "615", "773"]),
+                                   e=rng.randint(201, 999), n=f"{rng.randint(0, 9999):04d}")
+        for _ in range(distinct)
+    ]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def benchmark(count=100000, distinct=5000):
+    numbers = sample_numbers(count, distinct)
+    previous_validate(numbers[0]) # load the metadata outside the timings
+    assert [previous_validate(n) for n in numbers] == [normalize_phone(n) is not None for n in numbers]
+
+    def cold():
+        normalize_phone.cache_clear()
+        for number in numbers:
+            normalize_phone(number)
+
+    cases = [
+        ("previous validator", lambda: [previous_validate(n) for n in numbers]),
+        ("normalize, cold cache", cold),
+        ("normalize, warm cache", lambda: [normalize_phone(n) for n in numbers]),
+    ]
+    print(f"{count} numbers, {distinct} distinct")
+    for name, run in cases:
+        seconds = min(timeit.repeat(run, number=1, repeat=3))
+        print(f"  {name:<22} {seconds * 1000:9.1f} ms  {seconds / count * 1e6:6.2f} us/number")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,153 @@
+#----------------------------------------------------------------------------#
+# Request profiling.
+#----------------------------------------------------------------------------#
+# Times every SQL statement and template render made while handling a
+# request and reports them in a Server-Timing header, e.g.
+#
+#   Server-Timing: db;dur=12.4;desc="7 queries", tmpl;dur=3.1, app;dur=18.9
+#
+# Statements slower than SLOW_QUERY_MS are written as JSON lines to the slow
+# query log together with the request's N slowest statements, so an N+1
+# regression shows up as one entry with a large query count.
+
+import heapq
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from logging import FileHandler
+
+from flask import current_app, g, request, has_app_context, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_query_log = logging.getLogger("fyyur.slow_queries")
+
+
+class RequestProfile:
+
+    def __init__(self, keep):
+        self.started = time.perf_counter()
+        self.keep = keep
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.slowest = [] # min-heap of (seconds, statement), at most `keep` long
+        self.has_slow_query = False
+
+    def record_query(self, statement, seconds, slow):
+        self.query_count += 1
+        self.db_seconds += seconds
+        self.has_slow_query = self.has_slow_query or slow
+        entry = (seconds, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def server_timing(self):
+        total = time.perf_counter() - self.started
+        return (f'db;dur={self.db_seconds * 1000:.1f};desc="{self.query_count} queries", '
+                f'tmpl;dur={self.template_seconds * 1000:.1f}, '
+                f'app;dur={total * 1000:.1f}')
+
+
+# Registered once on the Engine class, not per app, so building several apps
+# in one process (tests, importtime.py) doesn't time every statement twice.
+# The threshold comes from whichever app is current. The start time lives on
+# the statement's execution context, which is dropped with the statement, so
+# one that raises (and never reaches after_cursor_execute) leaves nothing
+# behind on the connection.
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._profile_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - context._profile_started
+    config = current_app.config if has_app_context() else {}
+    slow = seconds >= config.get("SLOW_QUERY_MS", 200) / 1000
+    profile = g.get("profile") if has_request_context() else None
+    if profile is not None:
+        profile.record_query(statement, seconds, slow)
+    elif slow:
+        # Outside a request (CLI commands), log the statement on its own
+        log_slow({"duration_ms": round(seconds * 1000, 1), "statement": statement})
+
+
+def add_log_file(path):
+    # One handler per file, however many apps log to it
+    path = os.path.abspath(path)
+    if not any(getattr(handler, "baseFilename", None) == path for handler in slow_query_log.handlers):
+        handler = FileHandler(path)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        slow_query_log.addHandler(handler)
+
+
+def init_profiling(app):
+    keep = app.config.get("PROFILE_SLOWEST_STATEMENTS", 5)
+
+    add_log_file(app.config.get("SLOW_QUERY_LOG", "slow_queries.log"))
+    slow_query_log.setLevel(logging.INFO)
+    slow_query_log.propagate = False
+
+    @before_render_template.connect_via(app)
+    def before_render(sender, template, context, **extra):
+        g.template_started = time.perf_counter()
+
+    @template_rendered.connect_via(app)
+    def after_render(sender, template, context, **extra):
+        profile = g.get("profile")
+        if profile is not None and "template_started" in g:
+            profile.template_seconds += time.perf_counter() - g.pop("template_started")
+
+    @app.before_request
+    def start_profile():
+        g.profile = RequestProfile(keep)
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop("profile", None)
+        if profile is None:
+            return response
+        response.headers["Server-Timing"] = profile.server_timing()
+        if profile.has_slow_query:
+            log_slow({
+                "method": request.method,
+                "path": request.path,
+                "endpoint": request.endpoint,
+                "query_count": profile.query_count,
+                "db_ms": round(profile.db_seconds * 1000, 1),
+                "template_ms": round(profile.template_seconds * 1000, 1),
+                "slowest": [
+                    {"duration_ms": round(seconds * 1000, 1), "statement": statement}
+                    for seconds, statement in sorted(profile.slowest, reverse=True)
+                ]
+            })
+        return response
+
+
+def log_slow(record):
+    record["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    slow_query_log.info(json.dumps(record))
+
+
+#  Benchmarks and tests
+#  ----------------------------------------------------------------
+
+@contextmanager
+def recorded_statements(engine):
+    # Collects (statement, parameters) for every statement run on engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
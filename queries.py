@@ -0,0 +1,427 @@
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+# `python queries.py venues` benchmarks the /venues listing query against
+# the previous per-area implementation on growing seeded catalogues;
+# `python queries.py shows` records time to first byte and peak RSS growth
+# of the /shows listing, paginated and streamed.
+
+import bisect
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from flask import g
+
+from models import db, Venue, Artist, Show
+
+
+#  Relationship loading policies
+#  ----------------------------------------------------------------
+# Venue.shows and Artist.shows are lazy by default. Views pick one of these
+# so that show rows are only hydrated where a page actually walks them, and
+# accidental lazy loads on pages that should never touch them fail loudly.
+
+VENUE_WITHOUT_SHOWS = (db.raiseload(Venue.shows),)
+VENUE_WITH_SHOWS = (db.selectinload(Venue.shows),)
+
+ARTIST_WITHOUT_SHOWS = (db.raiseload(Artist.shows),)
+ARTIST_WITH_SHOWS = (db.selectinload(Artist.shows),)
+
+
+def request_now():
+    # "Now" for upcoming/past splits, evaluated once per request
+    return g.setdefault("now", datetime.now())
+
+
+#  Upcoming show counter
+#  ----------------------------------------------------------------
+
+def upcoming_show_counts(show_column, ids, now=None):
+    # Maps each venue or artist id to its number of upcoming shows using one
+    # grouped query. `show_column` is Show.venue_id or Show.artist_id.
+    ids = list(ids)
+    if not ids:
+        return {}
+    if now is None:
+        now = request_now()
+
+    rows = db.session.query(show_column, db.func.count(Show.id)) \
+        .filter(show_column.in_(ids)) \
+        .filter(Show.start_time > now) \
+        .group_by(show_column)
+
+    counts = dict.fromkeys(ids, 0)
+    counts.update(rows)
+    return counts
+
+
+def counterpart_ids(show_column, counterpart_column, entity_id):
+    # Distinct ids on the other side of an entity's shows, e.g. every artist
+    # that has played a venue: counterpart_ids(Show.venue_id, Show.artist_id, id)
+    return [id for id, in db.session.query(counterpart_column).filter(show_column == entity_id).distinct()]
+
+
+def venue_summary_query():
+    # id, name, location and upcoming show count of every venue
+    return db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label("num_upcoming_shows")
+    )
+
+
+def artist_summary_query():
+    return db.session.query(
+        Artist.id,
+        Artist.name,
+        Artist.city,
+        Artist.state,
+        Artist.upcoming_shows_count.label("num_upcoming_shows")
+    )
+
+
+def after_id_page(query, id_column, after_id=None, limit=50):
+    # Keyset page of `query` ordered by id. Returns (rows, next after_id).
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+def venue_areas():
+    # Returns venues grouped by (city, state) along with their number of
+    # upcoming shows, read from the counters maintained by counters.py.
+    rows = venue_summary_query() \
+        .order_by(Venue.state, Venue.city, Venue.id) \
+        .all()
+
+    areas = []
+    for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+        areas.append({
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": venue.id,
+                "name": venue.name,
+                "num_upcoming_shows": venue.num_upcoming_shows
+            } for venue in venues]
+        })
+
+    return areas
+
+
+#  Show pages
+#  ----------------------------------------------------------------
+# Detail pages list a slice of a venue's or artist's shows at a time. Slices
+# are keyset-paginated on (start_time, id) so that deep pages cost the same
+# as the first one.
+
+SHOWS_PER_PAGE = 12
+
+
+def encode_cursor(start_time, show_id):
+    return f"{start_time.isoformat()},{show_id}"
+
+
+def decode_cursor(cursor):
+    # Returns (start_time, show_id) or None when the cursor is missing or malformed
+    try:
+        start_time, show_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(start_time), int(show_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def show_counts(show_column, entity_id, now):
+    # Past and upcoming show counts for one venue or artist in a single aggregate
+    return db.session.query(
+        db.func.count(db.case([(Show.start_time <= now, Show.id)], else_=None)).label("past_shows_count"),
+        db.func.count(db.case([(Show.start_time > now, Show.id)], else_=None)).label("upcoming_shows_count")
+    ).filter(show_column == entity_id).one()
+
+
+def shows_page(show_column, entity_id, counterpart, prefix,
+               upcoming_after=None, past_before=None, per_page=SHOWS_PER_PAGE, now=None):
+    # Builds the show sections of a venue or artist page. `counterpart` is the
+    # model on the other side of the show (Artist for a venue page, Venue for an
+    # artist page) and `prefix` names its columns in the resulting dicts.
+    if now is None:
+        now = request_now()
+
+    counts = show_counts(show_column, entity_id, now)
+
+    base = db.session.query(
+        Show.id.label("show_id"),
+        Show.start_time,
+        counterpart.id.label(prefix + "_id"),
+        counterpart.name.label(prefix + "_name"),
+        counterpart.image_link.label(prefix + "_image_link")
+    ).select_from(Show).join(counterpart).filter(show_column == entity_id)
+
+    # Upcoming shows, soonest first
+    upcoming = base.filter(Show.start_time > now)
+    cursor = decode_cursor(upcoming_after)
+    if cursor:
+        upcoming = upcoming.filter(
+            (Show.start_time > cursor[0]) |
+            ((Show.start_time == cursor[0]) & (Show.id > cursor[1]))
+        )
+    upcoming = upcoming.order_by(Show.start_time, Show.id).limit(per_page + 1).all()
+
+    # Past shows, most recent first
+    past = base.filter(Show.start_time <= now)
+    cursor = decode_cursor(past_before)
+    if cursor:
+        past = past.filter(
+            (Show.start_time < cursor[0]) |
+            ((Show.start_time == cursor[0]) & (Show.id < cursor[1]))
+        )
+    past = past.order_by(Show.start_time.desc(), Show.id.desc()).limit(per_page + 1).all()
+
+    def page(rows):
+        shows = [{
+            prefix + "_id": getattr(row, prefix + "_id"),
+            prefix + "_name": getattr(row, prefix + "_name"),
+            prefix + "_image_link": getattr(row, prefix + "_image_link"),
+            "start_time": row.start_time
+        } for row in rows[:per_page]]
+        next_cursor = None
+        if len(rows) > per_page:
+            last = rows[per_page - 1]
+            next_cursor = encode_cursor(last.start_time, last.show_id)
+        return shows, next_cursor
+
+    upcoming_shows, next_upcoming = page(upcoming)
+    past_shows, next_past = page(past)
+
+    return {
+        "upcoming_shows": upcoming_shows,
+        "upcoming_shows_count": counts.upcoming_shows_count,
+        "next_upcoming": next_upcoming,
+        "past_shows": past_shows,
+        "past_shows_count": counts.past_shows_count,
+        "next_past": next_past
+    }
+
+
+#  Show listing
+#  ----------------------------------------------------------------
+
+SHOWS_LISTING_PER_PAGE = 60
+
+
+def show_listing_query():
+    # Shows with the venue and artist columns the listing needs, in (start_time, id) order
+    return db.session.query(
+        Show.id.label("show_id"),
+        Show.start_time,
+        Venue.id.label("venue_id"),
+        Venue.name.label("venue_name"),
+        Artist.id.label("artist_id"),
+        Artist.name.label("artist_name"),
+        Artist.image_link.label("artist_image_link")
+    ).select_from(Show).join(Venue).join(Artist) \
+     .order_by(Show.start_time, Show.id)
+
+
+def show_listing_item(row):
+    return {
+        "show_id": row.show_id,
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.start_time
+    }
+
+
+def shows_listing(after=None, per_page=SHOWS_LISTING_PER_PAGE):
+    # Returns one keyset-paginated page of shows and the cursor for the next one
+    query = show_listing_query()
+    cursor = decode_cursor(after)
+    if cursor:
+        query = query.filter(
+            (Show.start_time > cursor[0]) |
+            ((Show.start_time == cursor[0]) & (Show.id > cursor[1]))
+        )
+    rows = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last = rows[per_page - 1]
+        next_cursor = encode_cursor(last.start_time, last.show_id)
+
+    return [show_listing_item(row) for row in rows[:per_page]], next_cursor
+
+
+def stream_shows(batch_size=500):
+    # Yields every show through a server-side cursor, batch_size rows at a time
+    query = show_listing_query() \
+        .execution_options(stream_results=True) \
+        .yield_per(batch_size)
+    for row in query:
+        yield show_listing_item(row)
+
+
+#  Bookings
+#  ----------------------------------------------------------------
+# A show occupies [start_time, end_time). Shows last at most a day, which
+# bounds how far back an overlap search has to look in the
+# (venue_id, start_time) / (artist_id, start_time) indexes.
+
+MAX_SHOW_DURATION = timedelta(days=1)
+
+
+def overlapping_shows(show_column, entity_id, start_time, end_time):
+    return db.session.query(Show.start_time, Show.end_time) \
+        .filter(show_column == entity_id) \
+        .filter(Show.start_time < end_time) \
+        .filter(Show.start_time > start_time - MAX_SHOW_DURATION) \
+        .filter(Show.end_time > start_time)
+
+
+def booking_conflict(venue_id, artist_id, start_time, end_time):
+    # Returns "venue" or "artist" if either is already booked for part of the
+    # requested time, otherwise None
+    if overlapping_shows(Show.venue_id, venue_id, start_time, end_time).first():
+        return "venue"
+    if overlapping_shows(Show.artist_id, artist_id, start_time, end_time).first():
+        return "artist"
+    return None
+
+
+class Bookings:
+    # Sorted, non-overlapping [start, end) intervals per venue or artist, so
+    # checking a new show is a binary search rather than a scan
+
+    def __init__(self):
+        self.starts = defaultdict(list)
+        self.ends = defaultdict(list)
+
+    def overlaps(self, key, start_time, end_time):
+        # The last interval starting before end_time is the only one that can
+        # reach past start_time, since the intervals don't overlap
+        i = bisect.bisect_left(self.starts[key], end_time)
+        return i > 0 and self.ends[key][i - 1] > start_time
+
+    def add(self, key, start_time, end_time):
+        i = bisect.bisect_left(self.starts[key], start_time)
+        self.starts[key].insert(i, start_time)
+        self.ends[key].insert(i, end_time)
+
+
+def existing_bookings(venue_ids, artist_ids, start_time, end_time):
+    # Bookings of the given venues and artists between start_time and
+    # end_time, read in one query; keys are ("venue", id) and ("artist", id)
+    bookings = Bookings()
+    rows = db.session.query(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time) \
+        .filter(Show.venue_id.in_(venue_ids) | Show.artist_id.in_(artist_ids)) \
+        .filter(Show.start_time < end_time) \
+        .filter(Show.start_time > start_time - MAX_SHOW_DURATION) \
+        .filter(Show.end_time > start_time) \
+        .order_by(Show.start_time)
+    for venue_id, artist_id, show_start, show_end in rows:
+        if venue_id in venue_ids:
+            bookings.add(("venue", venue_id), show_start, show_end)
+        if artist_id in artist_ids:
+            bookings.add(("artist", artist_id), show_start, show_end)
+    return bookings
+
+
+def open_slots(venue_id, start_time, end_time):
+    # Free (start, end) intervals of a venue between start_time and end_time
+    slots = []
+    free_from = start_time
+    booked = overlapping_shows(Show.venue_id, venue_id, start_time, end_time).order_by(Show.start_time)
+    for show_start, show_end in booked:
+        if show_start > free_from:
+            slots.append((free_from, show_start))
+        free_from = max(free_from, show_end)
+    if free_from < end_time:
+        slots.append((free_from, end_time))
+    return slots
+
+
+#  Benchmark
+#  ----------------------------------------------------------------
+
+def previous_venue_areas():
+    # The /venues view as it was before venue_areas(): one query per area and
+    # a lazy load of every venue's shows (DISTINCT ON spelled portably)
+    data = []
+    for city, state in db.session.query(Venue.city, Venue.state).distinct():
+        venues = Venue.query.filter_by(city=city, state=state).all()
+        data.append({"city": city, "state": state, "venues": [{
+            "id": venue.id,
+            "name": venue.name,
+            "num_upcoming_shows": len([show for show in venue.shows if show.start_time > datetime.now()])
+        } for venue in venues]})
+    return data
+
+
+def benchmark_venues(sizes=(1000, 10000, 100000)):
+    import time
+    from profiling import recorded_statements
+    from seed import seeded_app
+
+    print(f"{'shows':>8}  {'implementation':<16} {'queries':>8} {'ms':>9}")
+    for shows in sizes:
+        app = seeded_app(shows)
+        for name, areas in (("previous", previous_venue_areas), ("venue_areas", venue_areas)):
+            with app.test_request_context():
+                with recorded_statements(db.engine) as statements:
+                    started = time.perf_counter()
+                    areas()
+                    elapsed = time.perf_counter() - started
+                db.session.remove()
+            print(f"{shows:>8}  {name:<16} {len(statements):>8} {elapsed * 1000:>9.1f}")
+
+
+def rss_bytes():
+    # Resident set size of this process (Linux), or None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def benchmark_shows(sizes=(10000, 100000, 1000000)):
+    import time
+    from seed import seeded_app
+
+    print(f"{'shows':>8}  {'mode':<10} {'ttfb ms':>9} {'total ms':>9} {'bytes':>12} {'peak rss +MB':>13}")
+    for shows in sizes:
+        app = seeded_app(shows)
+        client = app.test_client()
+        for mode, path in (("page", "/shows"), ("stream", "/shows?stream=1")):
+            before = peak = rss_bytes()
+            started = time.perf_counter()
+            response = client.get(path, buffered=False)
+            first_byte, size = None, 0
+            for count, chunk in enumerate(response.response):
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                size += len(chunk)
+                if before is not None and count % 256 == 0:
+                    peak = max(peak, rss_bytes())
+            response.close()
+            total = time.perf_counter() - started
+            growth = f"{(peak - before) / 2 ** 20:13.1f}" if before is not None else f"{'-':>13}"
+            print(f"{shows:>8}  {mode:<10} {first_byte * 1000:>9.1f} {total * 1000:>9.1f} {size:>12} {growth}")
+
+
+BENCHMARKS = {"venues": benchmark_venues, "shows": benchmark_shows}
+
+
+if __name__ == '__main__':
+    import sys
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -0,0 +1,141 @@
+#----------------------------------------------------------------------------#
+# Connection pooling and read-replica routing.
+#----------------------------------------------------------------------------#
+# Views marked @read_only run their queries on one of the replica engines in
+# SQLALCHEMY_BINDS (keys starting with "replica"), one picked per request;
+# everything else, and any flush, goes to the primary. A client that has just
+# written is pinned to the primary for REPLICA_LAG_GRACE seconds so it reads
+# its own writes.
+
+import random
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context, session as client_session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm, event
+
+REPLICA_PREFIX = "replica"
+
+
+#  Pool metrics
+#  ----------------------------------------------------------------
+
+class PoolStats:
+    # Checkout counts and time spent waiting for a connection, per engine
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self.lock = threading.Lock()
+
+    def record(self, waited, timed_out=False):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self):
+        pool = self.pool
+        stats = {
+            "checkouts": self.checkouts,
+            "wait_seconds": self.wait_seconds,
+            "max_wait_seconds": self.max_wait_seconds,
+            "timeouts": self.timeouts,
+        }
+        # QueuePool gauges; other pool classes don't keep them
+        for gauge in ("size", "checkedout", "overflow", "checkedin"):
+            if hasattr(pool, gauge):
+                stats[gauge] = getattr(pool, gauge)()
+        return stats
+
+
+_pool_stats = {}
+
+
+def instrument_pool(name, pool):
+    stats = _pool_stats[name] = PoolStats(pool)
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            connection = connect()
+        except Exception:
+            stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        stats.record(time.perf_counter() - started)
+        return connection
+
+    pool.connect = timed_connect
+
+
+def pool_stats():
+    # {engine url (password hidden): stats} for every engine created so far
+    return {name: stats.snapshot() for name, stats in _pool_stats.items()}
+
+
+#  Routing
+#  ----------------------------------------------------------------
+
+def read_only(view):
+    # Marks a view as safe to serve from a replica
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if client_session.get("_primary_until", 0) < time.time():
+            g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(SignallingSession):
+
+    def __init__(self, db, **options):
+        # SignallingSession doesn't keep a reference to its SQLAlchemy object
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not self._flushing and has_request_context() and g.get("read_only"):
+            replicas = self.db.replica_binds(self.app)
+            if replicas:
+                # One replica per request, so its reads see a single snapshot
+                if "replica" not in g:
+                    g.replica = random.choice(replicas)
+                return self.db.get_engine(self.app, bind=g.replica)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        session_factory = orm.sessionmaker(class_=RoutingSession, db=self, **options)
+        self._pin_writers(session_factory)
+        return session_factory
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        instrument_pool(repr(engine.url), engine.pool)
+        return engine
+
+    def replica_binds(self, app):
+        binds = app.config.get("SQLALCHEMY_BINDS") or {}
+        return [key for key in binds if key.startswith(REPLICA_PREFIX)]
+
+    def _pin_writers(self, session_factory):
+        @event.listens_for(session_factory, "after_flush")
+        def wrote(session, flush_context):
+            if has_request_context():
+                g.wrote = True
+
+        @event.listens_for(session_factory, "after_commit")
+        def pin(session):
+            if has_request_context() and g.pop("wrote", False):
+                grace = session.app.config.get("REPLICA_LAG_GRACE", 5)
+                client_session["_primary_until"] = time.time() + grace
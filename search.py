@@ -0,0 +1,188 @@
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+# `python search.py [artists]` benchmarks search latency against the previous
+# unindexed ILIKE scan on a table of 1M artists (pg_trgm on Postgres via
+# TEST_DATABASE_URL, the in-process index elsewhere).
+
+import weakref
+from collections import defaultdict
+
+from models import db, Venue, Artist
+
+
+# Columns matched by partial, case-insensitive search on each model
+SEARCH_COLUMNS = {
+    Venue: ("name", "city", "state"),
+    Artist: ("name", "city", "state"),
+}
+
+SEARCH_LIMIT = 50
+
+
+def trigrams(text):
+    # Padded, lower-cased character trigrams, as pg_trgm computes them
+    text = f"  {text.lower()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NgramIndex:
+    # In-process trigram inverted index, used when the database has no pg_trgm
+    # (e.g. SQLite test databases). It answers the same question as
+    # `column ILIKE '%term%'` on any of the indexed fields, ranked by trigram
+    # similarity.
+
+    def __init__(self):
+        self.fields = {}
+        self.postings = defaultdict(set)
+
+    def add(self, doc_id, values):
+        values = tuple(value.lower() for value in values if value)
+        self.fields[doc_id] = values
+        for value in values:
+            for gram in trigrams(value):
+                self.postings[gram].add(doc_id)
+
+    def search(self, term, limit=None):
+        # Returns (count, ids) for every document with a field containing term
+        term = term.lower()
+        if len(term) < 3:
+            # Too short to have inner trigrams; fall back to a scan
+            candidates = set(self.fields)
+        else:
+            # A substring shares all of its unpadded trigrams with the text
+            grams = [term[i:i + 3] for i in range(len(term) - 2)]
+            postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set.intersection(*postings)
+
+        query_grams = trigrams(term)
+        matches = []
+        for doc_id in candidates:
+            values = self.fields[doc_id]
+            if not any(term in value for value in values):
+                continue
+            score = max((similarity(query_grams, trigrams(value)) for value in values), default=0)
+            matches.append((-score, doc_id))
+
+        matches.sort()
+        ids = [doc_id for _, doc_id in matches]
+        if limit is not None:
+            return len(ids), ids[:limit]
+        return len(ids), ids
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+#  Fallback index cache
+#  ----------------------------------------------------------------
+# One index per engine and model, so apps bound to different databases (tests,
+# benchmarks) never share one. Each is stamped with its table's row count and
+# latest updated_at, the validators listing_state() uses, and checked against
+# them before every search: a write from any session, worker or bulk Core
+# insert changes the stamp, so the next search rebuilds. That costs one
+# aggregate query per search; the fallback only runs where there is no
+# pg_trgm (SQLite tests, development and benchmarks), never on Postgres.
+
+_indexes = weakref.WeakKeyDictionary() # engine -> {model: (stamp, NgramIndex)}
+
+
+def invalidate_index(model):
+    # Drops model's indexes now rather than at their next search
+    for indexes in list(_indexes.values()):
+        indexes.pop(model, None)
+
+
+def index_stamp(model):
+    return tuple(db.session.query(db.func.count(model.id), db.func.max(model.updated_at)).one())
+
+
+def fallback_index(model):
+    # The engine this session reads model from: a replica in @read_only views
+    indexes = _indexes.setdefault(db.session.get_bind(db.inspect(model)), {})
+    stamp = index_stamp(model)
+    entry = indexes.get(model)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    index = NgramIndex()
+    columns = [getattr(model, name) for name in SEARCH_COLUMNS[model]]
+    for row in db.session.query(model.id, *columns):
+        index.add(row[0], row[1:])
+    indexes[model] = (stamp, index)
+    return index
+
+
+#  Search entry point
+#  ----------------------------------------------------------------
+
+def search(model, term, limit=SEARCH_LIMIT, options=()):
+    # Returns (count, instances) of `model` matching term, best matches first.
+    # On Postgres this runs against the pg_trgm GIN indexes; elsewhere it uses
+    # the in-process trigram index.
+    columns = [getattr(model, name) for name in SEARCH_COLUMNS[model]]
+
+    if db.engine.dialect.name == "postgresql":
+        pattern = f"%{term}%"
+        matched = model.query.options(*options).filter(
+            db.or_(*[column.ilike(pattern) for column in columns])
+        )
+        rank = db.func.greatest(*[db.func.similarity(column, term) for column in columns])
+        count = matched.order_by(None).count()
+        results = matched.order_by(rank.desc(), model.id).limit(limit).all()
+        return count, results
+
+    count, ids = fallback_index(model).search(term, limit)
+    if not ids:
+        return count, []
+    by_id = {
+        instance.id: instance
+        for instance in model.query.options(*options).filter(model.id.in_(ids))
+    }
+    return count, [by_id[id] for id in ids if id in by_id]
+
+
+#  Benchmark
+#  ----------------------------------------------------------------
+
+def previous_search(model, term):
+    # The search views as they were before this module: unranked ILIKE on
+    # every column, every match loaded
+    pattern = f"%{term}%"
+    columns = [getattr(model, name) for name in SEARCH_COLUMNS[model]]
+    return model.query.filter(db.or_(*[column.ilike(pattern) for column in columns])).all()
+
+
+def benchmark(artists=1000000, terms=("velvet echo", "blue", "austin", "zz"), repeat=3):
+    import random
+    import time
+    import timeit
+    from datetime import datetime
+    import seed
+
+    app = seed.seeded_app(0)
+    with app.app_context():
+        seed.insert_batches(Artist.__table__, seed.artist_rows(random.Random(0), range(2, artists + 2), datetime.now()))
+        db.session.commit()
+        invalidate_index(Artist)
+        print(f"{artists} artists on {db.engine.dialect.name}, best of {repeat}")
+        if db.engine.dialect.name != "postgresql":
+            started = time.perf_counter()
+            fallback_index(Artist)
+            print(f"  in-process index built in {time.perf_counter() - started:.1f} s")
+
+        print(f"  {'term':<14} {'matches':>8} {'previous ms':>12} {'search ms':>10}")
+        for term in terms:
+            previous = min(timeit.repeat(lambda: previous_search(Artist, term), number=1, repeat=repeat))
+            current = min(timeit.repeat(lambda: search(Artist, term), number=1, repeat=repeat))
+            count, _ = search(Artist, term)
+            db.session.expunge_all()
+            print(f"  {term:<14} {count:>8} {previous * 1000:>12.1f} {current * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    import sys
+    import search # the app's copy of this module, whose index the views use
+    search.benchmark(*map(int, sys.argv[1:2]))
@@ -0,0 +1,210 @@
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#----------------------------------------------------------------------------#
+# `flask seed --shows 100000` fills the database with a reproducible,
+# realistically skewed catalogue for benchmarking: a few venues and artists
+# get most of the bookings (Zipf-distributed popularity), and shows are
+# spread over the two years around today. The same --seed always produces
+# the same data.
+
+import bisect
+import itertools
+import random
+from array import array
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+
+from models import db, Venue, Artist, Show, Genre, artist_genre, venue_genre
+from counters import count_bulk_shows
+from search import invalidate_index
+import cache
+from forms import GENRE_CHOICES, STATE_CHOICES
+
+BATCH_SIZE = 5000
+
+# Catalogue shape relative to the number of shows
+SHOWS_PER_VENUE = 50
+SHOWS_PER_ARTIST = 20
+
+# Shows start on the hour within a year either side of today
+SLOTS = 365 * 24
+SHOW_LENGTH = timedelta(hours=1)
+
+# A venue or artist plays at most half of the 2 * SLOTS + 1 hours, so a free
+# slot is always found in a few draws; bookings past the cap go to the next
+# pick instead.
+MAX_SHOWS_PER_ENTITY = SLOTS
+SLOT_ATTEMPTS = 100
+PICK_ATTEMPTS = 10000
+
+GENRES = [name for name, _ in GENRE_CHOICES]
+STATES = [name for name, _ in STATE_CHOICES]
+CITIES = ["San Francisco", "New York", "Austin", "Chicago", "Seattle", "Nashville",
+          "New Orleans", "Denver", "Atlanta", "Portland", "Boston", "Detroit"]
+WORDS = ["Blue", "Velvet", "Echo", "Gold", "Silver", "Midnight", "Electric", "Park",
+         "Square", "Hall", "Lounge", "Room", "Garden", "Harbor", "Union", "Crown"]
+
+
+def zipf_sampler(rng, n, s=1.1):
+    # Returns a function drawing indexes 0..n-1 with P(i) proportional to 1/(i+1)^s
+    cumulative = list(itertools.accumulate(1 / (i + 1) ** s for i in range(n)))
+    total = cumulative[-1]
+    return lambda: bisect.bisect_left(cumulative, rng.random() * total)
+
+
+def next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def name(rng, suffix):
+    return f"{rng.choice(WORDS)} {rng.choice(WORDS)} {suffix}"
+
+
+def insert_batches(table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def artist_rows(rng, ids, now):
+    for id in ids:
+        yield {
+            "id": id, "name": name(rng, "Band"), "city": rng.choice(CITIES), "state": rng.choice(STATES),
+            "phone": "+14155550100", "phone_e164": "+14155550100",
+            "seeking_venue": rng.random() < 0.3,
+            "image_link": f"https://picsum.photos/seed/a{id}/300",
+            "past_shows_count": 0, "upcoming_shows_count": 0, "updated_at": now
+        }
+
+
+def genre_links(rng, fk, ids, genre_ids):
+    for id in ids:
+        for genre_id in rng.sample(genre_ids, rng.randint(1, 3)):
+            yield {fk: id, "genre_id": genre_id}
+
+
+def reset_sequences():
+    # Explicit ids don't advance Postgres sequences
+    if db.engine.dialect.name == "postgresql":
+        for model in (Venue, Artist, Show):
+            table = model.__tablename__
+            db.session.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT coalesce(max(id), 1) FROM {table}))"
+            ))
+
+
+def free(slots, slot):
+    i = bisect.bisect_left(slots, slot)
+    return i == len(slots) or slots[i] != slot
+
+
+def book(rng, pick_venue, pick_artist, venue_slots, artist_slots):
+    # Returns (venue index, artist index, slot) for a new show: a venue and an
+    # artist under MAX_SHOWS_PER_ENTITY and an hour neither is booked for.
+    # venue_slots/artist_slots hold each entity's booked slots as a sorted
+    # array of ints, 4 bytes per booking.
+    for _ in range(PICK_ATTEMPTS):
+        venue, artist = pick_venue(), pick_artist()
+        booked_venue, booked_artist = venue_slots[venue], artist_slots[artist]
+        if len(booked_venue) >= MAX_SHOWS_PER_ENTITY or len(booked_artist) >= MAX_SHOWS_PER_ENTITY:
+            continue
+        for _ in range(SLOT_ATTEMPTS):
+            slot = rng.randint(-SLOTS, SLOTS)
+            if free(booked_venue, slot) and free(booked_artist, slot):
+                booked_venue.insert(bisect.bisect_left(booked_venue, slot), slot)
+                booked_artist.insert(bisect.bisect_left(booked_artist, slot), slot)
+                return venue, artist, slot
+    raise RuntimeError(f"No free venue/artist slot found after {PICK_ATTEMPTS} picks; "
+                       f"the catalogue is too small for this many shows")
+
+
+def seed(shows, seed=0):
+    rng = random.Random(seed)
+    now = datetime.now()
+    venues = max(1, shows // SHOWS_PER_VENUE)
+    artists = max(1, shows // SHOWS_PER_ARTIST)
+    if shows > min(venues, artists) * MAX_SHOWS_PER_ENTITY:
+        raise RuntimeError(f"{shows} shows don't fit in {SLOTS * 2 + 1} hour slots "
+                           f"across {min(venues, artists)} venues/artists")
+
+    genres = Genre.from_names(GENRES)
+    db.session.add_all(genres)
+    db.session.flush()
+    genre_ids = [genre.id for genre in genres]
+
+    first_venue, first_artist, first_show = next_id(Venue), next_id(Artist), next_id(Show)
+    venue_ids = range(first_venue, first_venue + venues)
+    artist_ids = range(first_artist, first_artist + artists)
+
+    insert_batches(Venue.__table__, ({
+        "id": id, "name": name(rng, "Venue"), "city": rng.choice(CITIES), "state": rng.choice(STATES),
+        "address": f"{rng.randint(1, 9999)} Main St", "phone": "326-123-5000",
+        "seeking_talent": rng.random() < 0.3, "image_link": f"https://picsum.photos/seed/v{id}/300",
+        "past_shows_count": 0, "upcoming_shows_count": 0, "updated_at": now
+    } for id in venue_ids))
+    insert_batches(Artist.__table__, artist_rows(rng, artist_ids, now))
+    insert_batches(venue_genre, genre_links(rng, "venue_id", venue_ids, genre_ids))
+    insert_batches(artist_genre, genre_links(rng, "artist_id", artist_ids, genre_ids))
+
+    pick_venue = zipf_sampler(rng, venues)
+    pick_artist = zipf_sampler(rng, artists)
+    # Shows fill whole hour slots; a slot already taken by the venue or the
+    # artist is redrawn so the data satisfies the overlap constraints
+    origin = now.replace(minute=0, second=0, microsecond=0)
+    venue_slots = [array("i") for _ in range(venues)]
+    artist_slots = [array("i") for _ in range(artists)]
+    batch = []
+    for id in range(first_show, first_show + shows):
+        venue, artist, slot = book(rng, pick_venue, pick_artist, venue_slots, artist_slots)
+        venue_id, artist_id = first_venue + venue, first_artist + artist
+        start_time = origin + timedelta(hours=slot)
+        batch.append({
+            "id": id, "venue_id": venue_id, "artist_id": artist_id,
+            "start_time": start_time, "end_time": start_time + SHOW_LENGTH,
+            "is_past": start_time <= now, "updated_at": now
+        })
+        if len(batch) == BATCH_SIZE or id == first_show + shows - 1:
+            db.session.execute(Show.__table__.insert(), batch)
+            count_bulk_shows(db.session.connection(), batch)
+            batch = []
+
+    reset_sequences()
+    db.session.commit()
+    invalidate_index(Venue)
+    invalidate_index(Artist)
+    cache.page_cache.clear()
+    cache.invalidate_fragments()
+    return venues, artists
+
+
+def seeded_app(shows, seed_value=0):
+    # A testing app (in-memory SQLite unless TEST_DATABASE_URL is set) holding
+    # a fresh catalogue, for the `python <module>.py` benchmarks
+    from app import create_app
+    from config import TestingConfig
+
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed(shows, seed_value)
+        db.session.remove()
+    return app
+
+
+@click.command("seed")
+@with_appcontext
+@click.option("--shows", default=10000, show_default=True, help="Number of shows to generate.")
+@click.option("--seed", "seed_value", default=0, show_default=True, help="Random seed.")
+def seed_command(shows, seed_value):
+    """Generate a synthetic catalogue for benchmarks and load tests."""
+    venues, artists = seed(shows, seed_value)
+    click.echo(f"Seeded {venues} venues, {artists} artists and {shows} shows.")
@@ -0,0 +1,49 @@
+#----------------------------------------------------------------------------#
+# Template caching.
+#----------------------------------------------------------------------------#
+# Compiled templates are kept on disk in JINJA_BYTECODE_CACHE_DIR, so a new
+# worker loads bytecode instead of parsing and compiling every template it
+# renders. Entries are keyed by the template source's checksum, so edited
+# templates are recompiled.
+#
+# {% cache key, ttl %}...{% endcache %} keeps the rendered body in
+# cache.fragment_cache under `key` (any hashable expression) for `ttl`
+# seconds, FRAGMENT_CACHE_TTL if left out. Every fragment is dropped when a
+# venue, artist, show or genre is written, see cache.invalidate_fragments().
+
+import os
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+import cache
+
+
+class FragmentCacheExtension(Extension):
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(["name:endcache"], drop_needle=True)
+        return nodes.CallBlock(self.call_method("_cached", args), [], [], body).set_lineno(lineno)
+
+    def _cached(self, key, ttl, caller):
+        key = ("fragment", key)
+        html = cache.fragment_cache.get(key)
+        if html is None:
+            html = caller()
+            cache.fragment_cache.set(key, html, ttl)
+        return html
+
+
+def init_templates(app):
+    directory = app.config.get("JINJA_BYTECODE_CACHE_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    app.jinja_env.add_extension(FragmentCacheExtension)
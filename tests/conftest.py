@@ -0,0 +1,55 @@
+#----------------------------------------------------------------------------#
+# Test fixtures.
+#----------------------------------------------------------------------------#
+# Tests build the app with TestingConfig: an in-memory SQLite database unless
+# TEST_DATABASE_URL points at a Postgres one, created from the models.
+# seeded_app fills it with seed.py's synthetic catalogue.
+
+import pytest
+
+import cache
+import seed
+from app import create_app
+from config import TestingConfig
+from models import db
+
+
+def build_app(config=TestingConfig):
+    app = create_app(config)
+    cache.page_cache.clear()
+    cache.invalidate_fragments()
+    return app
+
+
+@pytest.fixture
+def app():
+    # Requests push their own app context (and so a fresh `g`), as in a server
+    app = build_app()
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+# Shows in seeded_app's catalogue
+SEEDED_SHOWS = 2000
+
+
+@pytest.fixture(scope="module")
+def seeded_app():
+    app = build_app()
+    with app.app_context():
+        db.create_all()
+        seed.seed(SEEDED_SHOWS)
+        db.session.remove()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,116 @@
+# Timings for every route against a seeded catalogue. Benchmarks are off by
+# default (see pytest.ini) and each route simply runs once; measure with
+#
+#   pytest tests/test_benchmarks.py --benchmark-enable
+#
+# and compare runs with --benchmark-autosave / --benchmark-compare.
+
+import itertools
+from datetime import datetime, timedelta
+
+import pytest
+
+import loadtest
+from models import db, Artist, Show, Venue
+
+VENUE_FORM = {
+    "name": "Bench Hall", "city": "Austin", "state": "TX", "address": "1 Main St",
+    "phone": "512-555-0100", "genres": "Jazz", "facebook_link": "", "image_link": "",
+    "website_link": "", "seeking_description": ""
+}
+ARTIST_FORM = {
+    "name": "Bench Band", "city": "Austin", "state": "TX", "phone": "+1 512 555 0100",
+    "genres": "Jazz", "facebook_link": "", "image_link": "", "website_link": "", "seeking_description": ""
+}
+
+# Past the seeded year, one hour apart, so every new show is accepted
+_show_slots = itertools.count()
+
+
+def show_form():
+    start_time = datetime(2040, 1, 1) + timedelta(hours=next(_show_slots))
+    return {"artist_id": "1", "venue_id": "1", "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "duration": "60"}
+
+
+# (name, method, path, form data or a function returning it); the load
+# test's routes, less the ASGI ones, plus the rest of the app
+ROUTES = [route for route in loadtest.ROUTES if not route[2].startswith(loadtest.ASYNC_PREFIX)] + [
+    ("api_availability", "GET", "/api/v1/venues/{venue}/availability", None),
+    ("export_venues", "GET", "/export/venues", None),
+    ("export_artists", "GET", "/export/artists", None),
+    ("export_shows", "GET", "/export/shows", None),
+    ("pool_health", "GET", "/health/pool", None),
+    ("metrics", "GET", "/metrics", None),
+    ("create_venue", "POST", "/venues/create", VENUE_FORM),
+    ("create_artist", "POST", "/artists/create", ARTIST_FORM),
+    ("create_show", "POST", "/shows/create", show_form),
+    ("edit_venue_submission", "POST", "/venues/{venue}/edit", VENUE_FORM),
+    ("edit_artist_submission", "POST", "/artists/{artist}/edit", ARTIST_FORM),
+]
+
+
+# What each POST route must leave behind: a row count that grows or a field
+# that ends up holding the submitted value
+WRITES = {
+    "create_venue": lambda: Venue.query.count(),
+    "create_artist": lambda: Artist.query.count(),
+    "create_show": lambda: Show.query.count(),
+    "edit_venue_submission": lambda: Venue.query.get(1).name,
+    "edit_artist_submission": lambda: Artist.query.get(1).name,
+}
+
+
+def observe(app, name):
+    with app.app_context():
+        return WRITES[name]()
+
+
+def url(path):
+    # The most booked venue and artist
+    return path.format(venue=1, artist=1)
+
+
+@pytest.mark.parametrize("name, method, path, data", ROUTES, ids=[route[0] for route in ROUTES])
+def test_route(benchmark, seeded_app, name, method, path, data):
+    client = seeded_app.test_client()
+    before = observe(seeded_app, name) if name in WRITES else None
+
+    def call():
+        response = client.open(url(path), method=method, data=data() if callable(data) else data)
+        response.close()
+        return response
+
+    response = benchmark(call)
+    assert response.status_code in (200, 302), response.status_code
+    if name not in WRITES:
+        return
+    # A form that fails validation re-renders with a 200 and a failed write
+    # redirects, so the status alone says nothing about whether it wrote
+    after = observe(seeded_app, name)
+    if name.startswith("create"):
+        assert after > before
+    else:
+        assert after == data["name"] != before
+
+
+def test_delete_venue(benchmark, seeded_app):
+    client = seeded_app.test_client()
+
+    def new_venue():
+        with seeded_app.app_context():
+            venue = Venue(name="Doomed Hall", city="Austin", state="TX", address="1 Main St", phone="512-555-0100")
+            db.session.add(venue)
+            db.session.commit()
+            return (f"/venues/{venue.id}",), {}
+
+    response = benchmark.pedantic(lambda path: client.delete(path), setup=new_venue, rounds=20)
+    assert response.status_code == 200
+
+
+def test_every_route_is_benchmarked(seeded_app):
+    adapter = seeded_app.url_map.bind("localhost")
+    benchmarked = {adapter.match(url(path).split("?")[0], method)[0] for _, method, path, _ in ROUTES}
+    benchmarked.add("main.delete_venue")
+    endpoints = {rule.endpoint for rule in seeded_app.url_map.iter_rules()} - {"static"}
+    assert endpoints - benchmarked == set()
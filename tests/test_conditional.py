@@ -0,0 +1,56 @@
+# ETag/Last-Modified on cached detail pages always describe the body served
+
+import time
+from datetime import datetime, timedelta
+
+import cache
+from models import db, Artist, Show
+
+
+def rename_elsewhere(app, artist_id, name):
+    # A write from another worker: no invalidation reaches this process
+    with app.app_context():
+        db.session.execute(Artist.__table__.update().where(Artist.id == artist_id)
+                           .values(name=name, updated_at=datetime.utcnow()))
+        db.session.commit()
+
+
+def test_cached_body_keeps_its_etag(seeded_app):
+    cache.page_cache.clear()
+    client = seeded_app.test_client()
+    first = client.get("/artists/1")
+    rename_elsewhere(seeded_app, 1, "Renamed Elsewhere")
+
+    cached = client.get("/artists/1")
+    assert cached.data == first.data
+    assert cached.headers["ETag"] == first.headers["ETag"]
+    assert client.get("/artists/1", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    cache.page_cache.clear()
+    fresh = client.get("/artists/1")
+    assert b"Renamed Elsewhere" in fresh.data
+    assert fresh.headers["ETag"] != first.headers["ETag"]
+    assert client.get("/artists/1", headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
+
+
+def test_entry_expires_when_next_show_starts(seeded_app):
+    cache.page_cache.clear()
+    soon = datetime.now() + timedelta(seconds=30)
+    with seeded_app.app_context():
+        db.session.add(Show(venue_id=2, artist_id=2, start_time=soon, end_time=soon + timedelta(hours=1)))
+        db.session.commit()
+    seeded_app.test_client().get("/venues/2")
+    expires, _ = cache.page_cache.entries[cache.venue_page_key(2)]
+    assert expires - time.monotonic() <= 31
+
+
+def test_default_availability_window_moves_with_time(seeded_app):
+    client = seeded_app.test_client()
+    first = client.get("/api/v1/venues/1/availability")
+    later = client.get("/api/v1/venues/1/availability", headers={"If-None-Match": first.headers["ETag"]})
+    assert later.status_code == 200
+    assert later.get_json()["from"] != first.get_json()["from"]
+
+    fixed = "/api/v1/venues/1/availability?from=2040-01-01T00:00:00"
+    etag = client.get(fixed).headers["ETag"]
+    assert client.get(fixed, headers={"If-None-Match": etag}).status_code == 304
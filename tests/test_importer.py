@@ -0,0 +1,66 @@
+# Bulk import of shows: rejected rows and the queries a batch costs
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import importer
+from models import db, Venue, Artist, Show
+from profiling import recorded_statements
+
+START = datetime(2040, 6, 1, 20)
+
+
+@pytest.fixture
+def catalogue(app):
+    with app.app_context():
+        for id in (1, 2):
+            db.session.add(Venue(id=id, name=f"Venue {id}", city="Austin", state="TX",
+                                 address="1 Main St", phone="512-555-0100"))
+            db.session.add(Artist(id=id, name=f"Artist {id}", city="Austin", state="TX", phone="+15125550100",
+                                  image_link=""))
+        db.session.add(Show(venue_id=1, artist_id=1, start_time=START, end_time=START + timedelta(hours=2)))
+        db.session.commit()
+    return app
+
+
+def write_shows(path, shows):
+    with open(path, "w") as f:
+        for venue_id, artist_id, start_time in shows:
+            f.write(json.dumps({"venue_id": venue_id, "artist_id": artist_id, "duration": 60,
+                                "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S")}) + "\n")
+    return str(path)
+
+
+def test_rejects_conflicting_shows(catalogue, tmp_path):
+    path = write_shows(tmp_path / "shows.jsonl", [
+        (2, 2, START + timedelta(days=1)),               # ok
+        (2, 1, START + timedelta(days=1, minutes=30)),   # venue 2 already booked in this file
+        (1, 2, START + timedelta(hours=1)),              # venue 1 already booked in the database
+        (2, 1, START + timedelta(hours=1)),              # artist 1 already booked in the database
+        (3, 2, START + timedelta(days=2)),               # no such venue
+        (2, 1, START + timedelta(days=1, hours=1)),      # ok: starts as the first one ends
+    ])
+    with catalogue.app_context():
+        report, = importer.import_file("shows", path)
+        assert report["inserted"] == 2
+        assert {line: list(errors.values())[0][0] for line, errors in report["rejected"]} == {
+            2: "Overlaps another show in this file.",
+            3: "The venue is already booked at that time.",
+            4: "The artist is already booked at that time.",
+            5: "No such venue.",
+        }
+        assert Show.query.count() == 3
+
+
+def test_batch_checks_take_fixed_queries(catalogue, tmp_path):
+    shows = [(1 + i % 2, 1 + (i // 2) % 2, START + timedelta(days=1 + i)) for i in range(200)]
+    path = write_shows(tmp_path / "shows.jsonl", shows)
+    with catalogue.app_context():
+        with recorded_statements(db.engine) as statements:
+            report, = importer.import_file("shows", path)
+        assert report["inserted"] == 200
+        selects = [statement for statement, _ in statements if statement.lstrip().startswith("SELECT")]
+        # Known artists, known venues and existing bookings
+        assert len(selects) == 3
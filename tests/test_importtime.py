@@ -0,0 +1,10 @@
+# Startup stays within importtime.py's budget, so new import-time work is
+# caught here instead of in worker boot times
+
+from importtime import IMPORT_BUDGET_MS, measure
+
+
+def test_import_budget():
+    total, imports = measure()
+    slowest = sorted(imports, reverse=True)[:5]
+    assert total <= IMPORT_BUDGET_MS, f"{total:.0f} ms over the {IMPORT_BUDGET_MS} ms budget; slowest: {slowest}"
@@ -0,0 +1,93 @@
+# Statement counts and ORM rows loaded per endpoint, so an N+1 or a page that
+# starts hydrating every show fails here rather than in production. Pages
+# are requested once beforehand to warm the search index and caches that a
+# running server keeps; the page cache is cleared so each view really runs.
+
+from collections import Counter
+
+import pytest
+from sqlalchemy import event
+
+import cache
+from models import db, Venue, Artist
+from search import SEARCH_LIMIT
+from profiling import recorded_statements
+
+
+@pytest.fixture
+def loaded(seeded_app):
+    # Counts instances hydrated by the ORM, per model name
+    counts = Counter()
+
+    def count(target, context):
+        counts[type(target).__name__] += 1
+
+    event.listen(db.Model, "load", count, propagate=True)
+    yield counts
+    event.remove(db.Model, "load", count)
+
+
+def request(app, loaded, method, path, data=None):
+    # Returns the number of statements the request ran
+    client = app.test_client()
+    client.open(path, method=method, data=data)
+    cache.page_cache.clear()
+    loaded.clear()
+    with app.app_context():
+        with recorded_statements(db.engine) as statements:
+            response = client.open(path, method=method, data=data)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def genre_count(app, model, id):
+    with app.app_context():
+        return len(model.query.get(id).genres)
+
+
+@pytest.mark.parametrize("model, path", [(Venue, "/venues/1"), (Artist, "/artists/1")])
+def test_detail_page(seeded_app, loaded, model, path):
+    # Validators, the entity, show counts, one page each of upcoming and
+    # past shows, and the genres
+    genres = genre_count(seeded_app, model, 1)
+    assert request(seeded_app, loaded, "GET", path) == 6
+    assert loaded == {model.__name__: 1, "Genre": genres}
+
+
+@pytest.mark.parametrize("path", ["/venues/1", "/artists/1"])
+def test_cached_detail_page(seeded_app, loaded, path):
+    # A page-cache hit, conditional or not, never reaches the database
+    client = seeded_app.test_client()
+    etag = client.get(path).headers["ETag"]
+    with seeded_app.app_context():
+        with recorded_statements(db.engine) as statements:
+            assert client.get(path).status_code == 200
+            assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+    assert statements == []
+
+
+@pytest.mark.parametrize("model, path", [(Venue, "/venues/1/edit"), (Artist, "/artists/1/edit")])
+def test_edit_form(seeded_app, loaded, model, path):
+    # The entity alone
+    assert request(seeded_app, loaded, "GET", path) == 1
+    assert loaded == {model.__name__: 1}
+
+
+@pytest.mark.parametrize("model, path, term", [
+    (Venue, "/venues/search", "hall"),
+    (Artist, "/artists/search", "band"),
+])
+def test_search(seeded_app, loaded, model, path, term):
+    # Postgres: match count, matches, upcoming show counts. Elsewhere the
+    # in-process index answers the count after checking its stamp, so the
+    # stamp, the matches and the counts.
+    assert request(seeded_app, loaded, "POST", path, {"search_term": term}) == 3
+    assert set(loaded) == {model.__name__}
+    assert 0 < loaded[model.__name__] <= SEARCH_LIMIT
+
+
+@pytest.mark.parametrize("path", ["/venues", "/artists", "/shows"])
+def test_listing(seeded_app, loaded, path):
+    # Validators and one query for the rows, read as plain tuples
+    assert request(seeded_app, loaded, "GET", path) == 2
+    assert loaded == {}
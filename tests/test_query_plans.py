@@ -0,0 +1,70 @@
+# The queries behind the hot pages must reach show rows through an index. Each
+# page's statements are recorded and EXPLAINed; a full scan of the show table
+# fails the test. On Postgres (TEST_DATABASE_URL) the planner is told to avoid
+# sequential scans, so one only appears when no index can serve the query.
+
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+import cache
+from models import db, Show
+from queries import booking_conflict, encode_cursor
+from profiling import recorded_statements
+
+HOT_PAGES = [
+    ("GET", "/venues/1", None),
+    ("GET", "/artists/1", None),
+    ("GET", "/venues/1?upcoming_after={cursor}&past_before={cursor}", None),
+    ("GET", "/api/v1/venues/1", None),
+    ("GET", "/api/v1/artists/1", None),
+    ("GET", "/api/v1/venues/1/availability", None),
+    ("GET", "/shows", None),
+    ("GET", "/shows?after={cursor}", None),
+    ("GET", "/api/v1/shows", None),
+    ("POST", "/venues/search", {"search_term": "hall"}),
+    ("POST", "/artists/search", {"search_term": "band"}),
+]
+
+# SQLite: "SCAN show" without "USING ... INDEX"; Postgres: "Seq Scan on show"
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?show\b(?!.*USING)|Seq Scan on show\b")
+
+
+def plan(statement, parameters):
+    connection = db.session.connection()
+    if db.engine.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        rows = connection.exec_driver_sql("EXPLAIN " + statement, parameters)
+        return [row[0].strip().lstrip("-> ") for row in rows]
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+    return [row[-1] for row in rows]
+
+
+def full_scans(statements):
+    scans = []
+    for statement, parameters in statements:
+        if statement.lstrip().upper().startswith("SELECT") and re.search(r"\bshow\b", statement):
+            scans += [(line, statement) for line in plan(statement, parameters) if FULL_SCAN.search(line)]
+    return scans
+
+
+@pytest.mark.parametrize("method, path, data", HOT_PAGES, ids=[path for _, path, _ in HOT_PAGES])
+def test_hot_pages_use_indexes(seeded_app, method, path, data):
+    cursor = encode_cursor(datetime.now(), 1)
+    client = seeded_app.test_client()
+    cache.page_cache.clear()
+    with seeded_app.app_context():
+        with recorded_statements(db.engine) as statements:
+            response = client.open(path.format(cursor=cursor), method=method, data=data)
+        assert response.status_code == 200
+        assert statements
+        assert full_scans(statements) == []
+
+
+def test_booking_conflict_uses_indexes(seeded_app):
+    with seeded_app.app_context():
+        show = Show.query.first()
+        with recorded_statements(db.engine) as statements:
+            booking_conflict(show.venue_id, show.artist_id + 1, show.start_time, show.start_time + timedelta(hours=1))
+        assert full_scans(statements) == []
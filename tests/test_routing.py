@@ -0,0 +1,70 @@
+# Read-replica routing, with two SQLite files standing in for the replicas
+
+import pytest
+from flask import g
+
+from config import TestingConfig
+from models import db, Venue
+from routing import REPLICA_PREFIX
+from conftest import build_app
+
+
+@pytest.fixture
+def replicated_app(tmp_path):
+    class ReplicatedConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_BINDS = {f"{REPLICA_PREFIX}{i}": f"sqlite:///{tmp_path / f'replica{i}.db'}" for i in range(2)}
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    app = build_app(ReplicatedConfig)
+    with app.app_context():
+        # The same venue in every database, named after the database it's in
+        for bind in [None, *ReplicatedConfig.SQLALCHEMY_BINDS]:
+            engine = db.get_engine(app, bind=bind)
+            db.Model.metadata.create_all(engine)
+            engine.execute(Venue.__table__.insert(), {
+                "id": 1, "name": bind or "primary", "city": "Austin", "state": "TX",
+                "address": "1 Main St", "phone": "512-555-0100"
+            })
+    yield app
+
+
+def venue_name(client):
+    return client.get("/api/v1/venues/1?fields=name").get_json()["name"]
+
+
+def test_read_only_requests_use_one_replica(replicated_app):
+    with replicated_app.test_request_context():
+        g.read_only = True
+        engines = {db.session.get_bind() for _ in range(20)}
+        assert len(engines) == 1
+        assert engines != {db.engine}
+
+
+def test_requests_spread_across_replicas(replicated_app):
+    client = replicated_app.test_client()
+    names = {venue_name(client) for _ in range(30)}
+    assert names == {"replica0", "replica1"}
+
+
+def test_flushes_go_to_primary(replicated_app):
+    with replicated_app.test_request_context():
+        g.read_only = True
+        assert Venue.query.get(1).name.startswith(REPLICA_PREFIX)
+        db.session.add(Venue(name="new", city="Austin", state="TX", address="2 Main St", phone="512-555-0101"))
+        db.session.commit()
+
+    count = db.select([db.func.count()]).select_from(Venue.__table__)
+    with replicated_app.app_context():
+        counts = {
+            bind: db.get_engine(replicated_app, bind=bind).execute(count).scalar()
+            for bind in [None, *replicated_app.config["SQLALCHEMY_BINDS"]]
+        }
+    assert counts == {None: 2, "replica0": 1, "replica1": 1}
+
+
+def test_writer_reads_from_primary(replicated_app):
+    client = replicated_app.test_client()
+    with client.session_transaction() as session:
+        session["_primary_until"] = float("inf")
+    assert venue_name(client) == "primary"
@@ -0,0 +1,53 @@
+# The in-process search index used where there is no pg_trgm: one per
+# database, and rebuilt after writes it was never told about
+
+import pytest
+
+from config import TestingConfig
+from models import db, Venue
+from search import search
+from conftest import build_app
+
+pytestmark = pytest.mark.skipif(
+    TestingConfig.SQLALCHEMY_DATABASE_URI.startswith("postgresql"),
+    reason="Postgres searches with pg_trgm"
+)
+
+
+def add_venue(app, id, name):
+    with app.app_context():
+        # Core, bypassing the session, as another worker's write would
+        db.engine.execute(Venue.__table__.insert(), {
+            "id": id, "name": name, "city": "Austin", "state": "TX",
+            "address": "1 Main St", "phone": "512-555-0100"
+        })
+
+
+def found(app, term):
+    with app.app_context():
+        _, venues = search(Venue, term)
+        return [venue.name for venue in venues]
+
+
+def test_apps_keep_their_own_index():
+    first, second = build_app(), build_app()
+    for app in (first, second):
+        with app.app_context():
+            db.create_all()
+    add_venue(first, 1, "Velvet Room")
+    add_venue(second, 1, "Echo Lounge")
+
+    assert found(first, "velvet") == ["Velvet Room"]
+    assert found(second, "velvet") == []
+    assert found(second, "echo") == ["Echo Lounge"]
+
+
+def test_index_sees_writes_made_elsewhere():
+    app = build_app()
+    with app.app_context():
+        db.create_all()
+    add_venue(app, 1, "Velvet Room")
+    assert found(app, "velvet") == ["Velvet Room"]
+
+    add_venue(app, 2, "Velvet Underground")
+    assert sorted(found(app, "velvet")) == ["Velvet Room", "Velvet Underground"]